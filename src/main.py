@@ -1,16 +1,301 @@
 import os
 import sys
 import json
+import math
+import hashlib
+import sqlite3
+import time
+import queue
+import threading
+import logging
+import bisect
+import heapq
+import re
+import html
+from html.parser import HTMLParser
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+import uuid
 import g4f
 import requests
 import markdown2
 import qtawesome as qta
+from urllib.parse import urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWebEngineWidgets import *
 
+logger = logging.getLogger(__name__)
+
+# AI models raced for chat, in order of preference. "timeout" is the time
+# allowed before the first token (and between tokens) in seconds,
+# "max_concurrency" caps in-flight requests per model.
+AI_MODELS = [
+    {"model": "gpt-4", "timeout": 30, "max_concurrency": 2},
+    {"model": "gpt-3.5-turbo", "timeout": 20, "max_concurrency": 4},
+]
+
+# Seconds to wait for the first token before firing a hedge request
+AI_HEDGE_DELAY = 4.0
+
+# Approximate token budget for the conversation sent with each chat request
+CHAT_CONTEXT_TOKENS = 3000
+
+# AI response cache: entries in memory, disk budget in bytes, default lifetime in seconds
+RESPONSE_CACHE_ENTRIES = 200
+RESPONSE_CACHE_DISK_BYTES = 20 * 1024 * 1024
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+
+# Disk budget for generated images in bytes
+IMAGE_STORE_BYTES = 200 * 1024 * 1024
+
+# Shared HTTP client: (connect, read) timeouts in seconds, retries and pooled connections per host
+HTTP_TIMEOUT = (5, 30)
+HTTP_RETRIES = 3
+HTTP_POOL_SIZE = 10
+
+# Seconds the window waits on close for cancelled background workers to finish
+WORKER_JOIN_TIMEOUT = 3
+
+# Memory for decoded image thumbnails in KB
+IMAGE_PIXMAP_CACHE_KB = 64 * 1024
+
+# Batch image generation: parallel jobs and retries per job
+IMAGE_BATCH_CONCURRENCY = 3
+IMAGE_BATCH_RETRIES = 2
+
+# Browsing history: seconds a tab must stay on a URL before it counts as a visit
+# (shorter hops are redirects) and visits kept per URL
+HISTORY_SETTLE_DELAY = 1.5
+HISTORY_VISITS_PER_URL = 50
+
+# Bookmark import/export: characters read per chunk and bookmarks per store write
+BOOKMARK_IO_CHUNK = 64 * 1024
+BOOKMARK_IMPORT_BATCH = 1000
+
+# Tab hibernation: memory budget for all tab renderers in MB, seconds between
+# checks, and the assumed size of a renderer whose memory can't be read
+TAB_MEMORY_BUDGET_MB = 1500
+TAB_MEMORY_CHECK_INTERVAL = 30
+TAB_ESTIMATED_MB = 150
+
+# Seconds between session snapshots (open tabs and UI state) written to disk
+SESSION_SAVE_INTERVAL = 30
+
+# Recently closed tabs kept for Ctrl+Shift+T
+CLOSED_TABS_LIMIT = 25
+
+# Seconds a background tab stays hidden before its page is frozen (timers and JS paused)
+TAB_FREEZE_DELAY = 5 * 60
+
+# URL bar autocomplete: most recent history URLs kept in memory, and suggestions shown
+OMNIBOX_INDEX_SIZE = 5000
+OMNIBOX_SUGGESTIONS = 8
+
+# Time spans offered by the history dialog's bulk delete, in seconds (None deletes everything)
+HISTORY_DELETE_RANGES = {
+    "Last hour": 60 * 60,
+    "Last 24 hours": 24 * 60 * 60,
+    "Last 7 days": 7 * 24 * 60 * 60,
+    "Last 4 weeks": 28 * 24 * 60 * 60,
+    "All time": None,
+}
+
+def app_data_path(*parts):
+    """Return a path inside the per-user Synth data directory"""
+    base = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".synth")
+    path = os.path.join(base, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+# True when a form field differs from its initial value, so freezing could lose typing
+FORM_DIRTY_SCRIPT = """
+(function() {
+    for (const el of document.querySelectorAll('input, textarea, select')) {
+        if (el.type === 'checkbox' || el.type === 'radio') {
+            if (el.checked !== el.defaultChecked) return true;
+        } else if (el.tagName === 'SELECT') {
+            for (const option of el.options) {
+                if (option.selected !== option.defaultSelected) return true;
+            }
+        } else if (el.type !== 'hidden' && el.value !== el.defaultValue) {
+            return true;
+        }
+    }
+    return false;
+})();
+"""
+
+def process_private_mb(pid):
+    """Memory only this process uses (what exiting it frees) in MB, or None
+    where /proc isn't available"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            kb = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:")))
+        return kb / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and swap it in so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ProviderHealth:
+    """Track per-model latency and failures, with a circuit breaker for bad models"""
+    FAILURE_THRESHOLD = 3  # consecutive failures before the circuit opens
+    COOLDOWN = 60  # seconds before a half-open probe is allowed
+    MAX_SAMPLES = 100
+    SAVE_INTERVAL = 30  # seconds between writes of changed stats
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.stats = {}
+        self.load()
+
+    def load(self):
+        """Load persisted stats"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    self.stats = json.load(f)
+        except:
+            self.stats = {}
+
+    def save(self):
+        """Persist stats to disk"""
+        try:
+            write_json_atomic(self.path, self.stats)
+        except Exception:
+            pass
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Write stats changed since the last save"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def _changed(self):
+        """Mark stats dirty and save at most once per SAVE_INTERVAL; call with the lock held"""
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.SAVE_INTERVAL:
+            self.save()
+
+    def _entry(self, model):
+        return self.stats.setdefault(model, {
+            "successes": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "latencies": [],
+            "last_error": None,
+            "last_provider": None,
+            "state": "closed",
+            "opened_at": 0,
+        })
+
+    def available(self, model):
+        """Return True if allow() would let a request through, without claiming a probe"""
+        with self._lock:
+            entry = self.stats.get(model)
+            if not entry or entry["state"] == "closed":
+                return True
+            return time.time() - entry["opened_at"] >= self.COOLDOWN
+
+    def allow(self, model):
+        """Return True if a request to this model may be sent; call when sending it"""
+        with self._lock:
+            entry = self._entry(model)
+            if entry["state"] == "closed":
+                return True
+
+            # Open or half-open: let one probe through per cooldown period
+            if time.time() - entry["opened_at"] >= self.COOLDOWN:
+                entry["state"] = "half_open"
+                entry["opened_at"] = time.time()
+                return True
+            return False
+
+    def record_success(self, model, latency, provider=None):
+        """Record a completed response and its time to first token"""
+        with self._lock:
+            entry = self._entry(model)
+            entry["successes"] += 1
+            entry["consecutive_failures"] = 0
+            entry["state"] = "closed"
+            entry["latencies"] = (entry["latencies"] + [round(latency, 3)])[-self.MAX_SAMPLES:]
+            if provider:
+                entry["last_provider"] = provider
+            self._changed()
+
+    def record_failure(self, model, error):
+        """Record a failed request and open the circuit if needed"""
+        with self._lock:
+            entry = self._entry(model)
+            entry["failures"] += 1
+            entry["consecutive_failures"] += 1
+            entry["last_error"] = str(error)[:200]
+            if entry["state"] == "half_open" or entry["consecutive_failures"] >= self.FAILURE_THRESHOLD:
+                entry["state"] = "open"
+                entry["opened_at"] = time.time()
+            self._changed()
+
+    def percentile(self, model, pct):
+        """Return the given latency percentile in seconds, or None"""
+        latencies = sorted(self.stats.get(model, {}).get("latencies", []))
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def order(self, specs):
+        """Sort model specs by observed median latency
+
+        Untried models go first in their configured order so they get
+        measured; models that have only failed go last.
+        """
+        def median(spec):
+            entry = self.stats.get(spec["model"])
+            if not entry or not entry["successes"] + entry["failures"]:
+                return 0
+            p50 = self.percentile(spec["model"], 50)
+            return math.inf if p50 is None else p50
+        return sorted(specs, key=median)
+
+    def summary(self, model):
+        """Return a one-line status for the settings dialog"""
+        entry = self.stats.get(model)
+        total = entry["successes"] + entry["failures"] if entry else 0
+        if not total:
+            return f"{model}: no data yet"
+
+        success_rate = entry["successes"] / total * 100
+        p50 = self.percentile(model, 50)
+        p95 = self.percentile(model, 95)
+        line = f"{model} ({entry['state'].replace('_', '-')}): {success_rate:.0f}% ok"
+        if p50 is not None:
+            line += f", p50 {p50:.1f}s, p95 {p95:.1f}s"
+        if entry["last_provider"]:
+            line += f", via {entry['last_provider']}"
+        if entry["last_error"]:
+            line += f"\n    last error: {entry['last_error']}"
+        return line
+
 class ToggleSwitch(QCheckBox):
     """Custom toggle switch widget"""
     def __init__(self, parent=None):
@@ -36,6 +321,2423 @@ class ToggleSwitch(QCheckBox):
         painter.setBrush(QColor(255, 255, 255))
         painter.drawEllipse(thumb_rect)
 
+class ProviderRace:
+    """Race g4f models: hedge slow requests and stream from the first to answer"""
+    def __init__(self, client, health=None, models=None, hedge_delay=AI_HEDGE_DELAY):
+        self.client = client
+        self.health = health
+        self.models = models or AI_MODELS
+        self.hedge_delay = hedge_delay
+        self._slots = {
+            spec["model"]: threading.BoundedSemaphore(spec.get("max_concurrency", 2))
+            for spec in self.models
+        }
+
+    def stream(self, messages, is_cancelled=lambda: False, info=None):
+        """Yield deltas from whichever model produces the first token"""
+        events = queue.Queue()
+        pending = self.candidates()
+        attempts = []
+        errors = []
+
+        def launch():
+            spec = pending.pop(0)
+            if self.health:
+                # Claims the half-open probe now that a request is really sent
+                self.health.allow(spec["model"])
+            attempt = {
+                "spec": spec,
+                "cancel": threading.Event(),
+                "last_event": time.monotonic(),
+                "done": False,
+            }
+            attempts.append(attempt)
+            threading.Thread(
+                target=self._run_attempt,
+                args=(attempt, messages, events),
+                daemon=True,
+            ).start()
+
+        def fail(attempt, error):
+            attempt["done"] = True
+            attempt["cancel"].set()
+            errors.append(f"{attempt['spec']['model']}: {error}")
+            if self.health:
+                self.health.record_failure(attempt["spec"]["model"], error)
+
+        winner = None
+        first_delta = None
+        launch()
+        next_hedge = time.monotonic() + self.hedge_delay
+
+        try:
+            # Race until some attempt produces a token
+            while winner is None:
+                if is_cancelled():
+                    return
+
+                now = time.monotonic()
+                for attempt in attempts:
+                    timeout = attempt["spec"].get("timeout", 30)
+                    if not attempt["done"] and now - attempt["last_event"] > timeout:
+                        fail(attempt, f"timed out after {timeout}s")
+
+                if not any(not a["done"] for a in attempts):
+                    if not pending:
+                        raise Exception(f"AI service unavailable. {', '.join(errors)}")
+                    # Everything in flight failed, don't wait for the hedge delay
+                    launch()
+                    next_hedge = now + self.hedge_delay
+                    continue
+
+                if pending and now >= next_hedge:
+                    launch()
+                    next_hedge = now + self.hedge_delay
+
+                try:
+                    attempt, kind, payload = events.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                if attempt["done"]:
+                    continue
+                if kind == "token":
+                    winner = attempt
+                    first_delta = payload
+                elif kind == "error":
+                    fail(attempt, payload)
+                elif kind == "end":
+                    fail(attempt, "empty response")
+        finally:
+            # Losers are cancelled; their threads exit at the next chunk
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt["cancel"].set()
+
+        if info is not None:
+            info["model"] = winner["spec"]["model"]
+        yield first_delta
+
+        # Stream the rest of the winning response
+        timeout = winner["spec"].get("timeout", 30)
+        try:
+            while True:
+                if is_cancelled():
+                    return
+                try:
+                    attempt, kind, payload = events.get(timeout=0.1)
+                except queue.Empty:
+                    if time.monotonic() - winner["last_event"] > timeout:
+                        if self.health:
+                            self.health.record_failure(winner["spec"]["model"], f"stalled for {timeout}s")
+                        raise Exception(f"{winner['spec']['model']}: stalled for {timeout}s")
+                    continue
+
+                if attempt is not winner:
+                    continue
+                if kind == "token":
+                    yield payload
+                elif kind == "end":
+                    return
+                else:
+                    if self.health:
+                        self.health.record_failure(winner["spec"]["model"], payload)
+                    raise Exception(f"{winner['spec']['model']}: {payload}")
+        finally:
+            winner["cancel"].set()
+
+    def candidates(self):
+        """Return the models to race, fastest first, skipping open circuits"""
+        if not self.health:
+            return list(self.models)
+
+        ordered = self.health.order(self.models)
+        allowed = [spec for spec in ordered if self.health.available(spec["model"])]
+        # If every circuit is open, trying anyway beats failing outright
+        return allowed or ordered
+
+    def _run_attempt(self, attempt, messages, events):
+        """Run one streaming request and forward its chunks to the race"""
+        spec = attempt["spec"]
+        slot = self._slots[spec["model"]]
+        if not slot.acquire(timeout=spec.get("timeout", 30)):
+            events.put((attempt, "error", "concurrency limit reached"))
+            return
+
+        stream = None
+        started = time.monotonic()
+        first_token = None
+        provider = None
+        try:
+            stream = self.client.chat.completions.create(
+                model=spec["model"],
+                messages=messages,
+                stream=True,
+            )
+            for chunk in stream:
+                if attempt["cancel"].is_set():
+                    return
+                provider = provider or getattr(chunk, "provider", None)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    attempt["last_event"] = time.monotonic()
+                    if first_token is None:
+                        first_token = attempt["last_event"] - started
+                    events.put((attempt, "token", delta))
+            events.put((attempt, "end", None))
+            if self.health and first_token is not None:
+                self.health.record_success(spec["model"], first_token, provider)
+        except Exception as e:
+            events.put((attempt, "error", str(e)))
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+            slot.release()
+
+class ContextWindow:
+    """Fit chat history into a token budget, folding older turns into a summary"""
+    FOLD_TARGET = 0.75  # fold down to this share of the budget so folds are rare
+    SUMMARY_SHARE = 0.25  # maximum share of the budget the summary may use
+
+    def __init__(self, budget=CHAT_CONTEXT_TOKENS):
+        self.budget = budget
+        self._token_counts = {}
+        # A cancelled worker may still be building when the next one starts
+        self._build_lock = threading.Lock()
+        self._generation = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the rolling summary"""
+        self.summary = ""
+        self.summary_until = None
+        self._generation += 1
+
+    def folded_count(self, messages):
+        """Return how many leading messages the summary already covers
+
+        The last folded message is kept so build() can still find where the
+        summary ends.
+        """
+        if self.summary_until is not None:
+            for index, message in enumerate(messages):
+                if message.get("id") == self.summary_until:
+                    return index
+        return 0
+
+    def count_tokens(self, message):
+        """Estimate tokens for a message, cached by message id"""
+        key = message.get("id")
+        count = self._token_counts.get(key) if key else None
+        if count is None:
+            # Roughly four characters per token plus per-message overhead
+            count = len(message["content"]) // 4 + 4
+            if key:
+                self._token_counts[key] = count
+        return count
+
+    def build(self, messages, summarize):
+        """Return the messages to send, summarizing turns that no longer fit"""
+        with self._build_lock:
+            return self._build(messages, summarize)
+
+    def _build(self, messages, summarize):
+        # Skip the turns already covered by the summary
+        start = 0
+        if self.summary_until is not None:
+            ids = [m.get("id") for m in messages]
+            if self.summary_until in ids:
+                start = ids.index(self.summary_until) + 1
+            else:
+                self.reset()
+
+        summary = self.summary
+        available = self.budget - len(summary) // 4
+        window_start = self._window_start(messages, start, available)
+
+        if window_start > start:
+            # Fold past the strict minimum so the next few turns reuse this summary
+            window_start = max(
+                window_start,
+                self._window_start(messages, start, int(available * self.FOLD_TARGET)),
+            )
+            folded = messages[start:window_start]
+            generation = self._generation
+            try:
+                summary = summarize(summary, folded)
+            except Exception:
+                summary = self._extract_summary(summary, folded)
+            max_chars = int(self.budget * self.SUMMARY_SHARE) * 4
+            summary = summary.strip()[-max_chars:]
+            # Don't resurrect a summary the GUI reset while this one was generated
+            if generation == self._generation:
+                self.summary = summary
+                self.summary_until = folded[-1].get("id")
+            start = window_start
+
+        context = []
+        if summary:
+            context.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            })
+        context.extend({"role": m["role"], "content": m["content"]} for m in messages[start:])
+        return context
+
+    def _window_start(self, messages, start, budget):
+        """Index of the oldest message that fits in the budget; the newest always fits"""
+        used = 0
+        index = len(messages)
+        while index > start:
+            tokens = self.count_tokens(messages[index - 1])
+            if used + tokens > budget and index < len(messages):
+                break
+            used += tokens
+            index -= 1
+        return index
+
+    def _extract_summary(self, summary, messages):
+        """Fallback summary used when the AI summary request fails"""
+        lines = [summary] if summary else []
+        for message in messages:
+            first_line = message["content"].strip().split("\n")[0]
+            lines.append(f"{message['role']}: {first_line[:160]}")
+        return "\n".join(lines)
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that prefix-matches every word"""
+    words = [w.replace('"', '""') for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words)
+
+class ChatSessionStore:
+    """SQLite store of named chat sessions with a full-text index over messages"""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT UNIQUE NOT NULL,
+                session_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session_seq ON messages (session_id, seq);
+        """)
+
+        # Full-text index kept in sync by triggers; fall back to LIKE without FTS5
+        try:
+            self.conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    content, content='messages', content_rowid='seq'
+                );
+                CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts (rowid, content) VALUES (new.seq, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content)
+                    VALUES ('delete', old.seq, old.content);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self.conn.commit()
+
+    def sessions(self):
+        """Return all sessions, most recently used first"""
+        return self.conn.execute(
+            "SELECT id, name, updated FROM sessions ORDER BY updated DESC"
+        ).fetchall()
+
+    def latest_session(self):
+        """Return the id of the most recently used session, or None"""
+        row = self.conn.execute("SELECT id FROM sessions ORDER BY updated DESC LIMIT 1").fetchone()
+        return row["id"] if row else None
+
+    def create_session(self, name="New chat"):
+        """Create an empty session and return its id"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "INSERT INTO sessions (name, created, updated) VALUES (?, ?, ?)", (name, now, now)
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def rename_session(self, session_id, name):
+        self.conn.execute("UPDATE sessions SET name = ? WHERE id = ?", (name, session_id))
+        self.conn.commit()
+
+    def delete_session(self, session_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def clear_session(self, session_id):
+        """Delete every message in a session"""
+        with self.conn:
+            self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def append_message(self, session_id, message):
+        """Append a single message without touching the rest of the session"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO messages (id, session_id, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                (message["id"], session_id, message["role"], message["content"], now)
+            )
+            self.conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session_id))
+
+    def recent_messages(self, session_id, limit):
+        """Return the newest page of messages in chronological order"""
+        rows = self.conn.execute(
+            "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def messages_before(self, session_id, message_id, limit):
+        """Return up to limit messages preceding message_id in chronological order"""
+        rows = self.conn.execute(
+            """
+            SELECT id, role, content FROM messages
+            WHERE session_id = ? AND seq < (SELECT seq FROM messages WHERE id = ?)
+            ORDER BY seq DESC LIMIT ?
+            """,
+            (session_id, message_id, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def messages_after(self, session_id, message_id, limit):
+        """Return up to limit messages following message_id in chronological order"""
+        rows = self.conn.execute(
+            """
+            SELECT id, role, content FROM messages
+            WHERE session_id = ? AND seq > (SELECT seq FROM messages WHERE id = ?)
+            ORDER BY seq LIMIT ?
+            """,
+            (session_id, message_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text, limit=50):
+        """Search all sessions and return matching messages, best matches first"""
+        if not text.strip():
+            return []
+
+        if self.has_fts:
+            sql = """
+                SELECT s.id AS session_id, s.name AS session_name, m.id, m.role,
+                       snippet(messages_fts, 0, '', '', '…', 12) AS snippet
+                FROM messages_fts
+                JOIN messages m ON m.seq = messages_fts.rowid
+                JOIN sessions s ON s.id = m.session_id
+                WHERE messages_fts MATCH ?
+                ORDER BY rank LIMIT ?
+            """
+            params = (fts_query(text), limit)
+        else:
+            sql = """
+                SELECT s.id AS session_id, s.name AS session_name, m.id, m.role,
+                       substr(m.content, 1, 120) AS snippet
+                FROM messages m JOIN sessions s ON s.id = m.session_id
+                WHERE m.content LIKE ?
+                ORDER BY m.seq DESC LIMIT ?
+            """
+            params = (f"%{text}%", limit)
+
+        try:
+            return self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+# Filler words dropped from history searches such as "pages about kubernetes last week"
+# Filler words dropped from a history search that names a time range ("pages from last week")
+HISTORY_STOPWORDS = {"page", "pages", "site", "sites", "about", "on", "from", "in", "the", "visited"}
+
+def parse_history_query(text):
+    """Split a history search into search words and a (since, until) time range"""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    ranges = [
+        ("yesterday", today - timedelta(days=1), today),
+        ("today", today, None),
+        ("this week", today - timedelta(days=today.weekday()), None),
+        ("last week", today - timedelta(days=7), None),
+        ("this month", today.replace(day=1), None),
+        ("last month", today - timedelta(days=30), None),
+    ]
+
+    since = until = None
+    lowered = f" {text.lower()} "
+    for phrase, start, end in ranges:
+        if f" {phrase} " in lowered:
+            lowered = lowered.replace(f" {phrase} ", " ")
+            since = start.timestamp()
+            until = end.timestamp() if end else None
+            break
+
+    words = lowered.split()
+    if since is not None:
+        words = [w for w in words if w not in HISTORY_STOPWORDS]
+    return " ".join(words), since, until
+
+def normalize_url(url):
+    """Canonical form of a URL for history: no fragment, lowercase host, no default port"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        return url.split("#", 1)[0]
+
+    host = parts.hostname or ""
+    if port and port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+class HistoryStore:
+    """SQLite browsing history with an FTS5 index; writes are batched on a background thread
+
+    One row per normalized URL with its visit count and last visit, plus a
+    visit log trimmed to HISTORY_VISITS_PER_URL entries per URL.
+    """
+    BATCH_WINDOW = 1.0  # seconds to gather writes into one transaction
+    CACHE_KB = 2048  # SQLite page cache per connection
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = self._connect()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                visit_count INTEGER NOT NULL DEFAULT 0,
+                last_visit REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS visits (
+                id INTEGER PRIMARY KEY,
+                url_id INTEGER NOT NULL,
+                visit_time REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS urls_last_visit ON urls (last_visit);
+            CREATE INDEX IF NOT EXISTS visits_time ON visits (visit_time);
+            CREATE INDEX IF NOT EXISTS visits_url_time ON visits (url_id, visit_time);
+        """)
+
+        # Only title and URL changes touch the full-text index, not visit counts
+        try:
+            self.conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS urls_fts USING fts5(
+                    title, url, content='urls', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS urls_ai AFTER INSERT ON urls BEGIN
+                    INSERT INTO urls_fts (rowid, title, url) VALUES (new.id, new.title, new.url);
+                END;
+                CREATE TRIGGER IF NOT EXISTS urls_ad AFTER DELETE ON urls BEGIN
+                    INSERT INTO urls_fts (urls_fts, rowid, title, url)
+                    VALUES ('delete', old.id, old.title, old.url);
+                END;
+                DROP TRIGGER IF EXISTS urls_au;
+                CREATE TRIGGER urls_au AFTER UPDATE OF title, url ON urls
+                WHEN old.title IS NOT new.title OR old.url IS NOT new.url BEGIN
+                    INSERT INTO urls_fts (urls_fts, rowid, title, url)
+                    VALUES ('delete', old.id, old.title, old.url);
+                    INSERT INTO urls_fts (rowid, title, url) VALUES (new.id, new.title, new.url);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self.conn.commit()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{self.CACHE_KB}")
+        return conn
+
+    # Writes (queued, never block the caller)
+    def add_visit(self, url, title, visit_time=None):
+        self._queue.put(("visit", normalize_url(url), title or "", visit_time or time.time()))
+
+    def set_title(self, url, title):
+        if title:
+            self._queue.put(("title", normalize_url(url), title))
+
+    def clear(self):
+        self._queue.put(("clear",))
+        self.flush()
+
+    def delete_range(self, since, until):
+        """Forget visits between two timestamps; URLs left without visits go too"""
+        self._queue.put(("delete_range", since, until))
+        self.flush()
+
+    def flush(self):
+        """Block until every queued write is on disk"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(5)
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(5)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.BATCH_WINDOW
+            while batch[-1] is not None and batch[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                with conn:
+                    for op in batch:
+                        if op is not None:
+                            self._apply(conn, op)
+            except sqlite3.Error as e:
+                # The transaction rolled back, so every write in the batch is lost
+                writes = sum(1 for op in batch if op is not None and op[0] != "flush")
+                logger.error("History: dropped %d queued writes: %s", writes, e)
+
+            for op in batch:
+                if op is None:
+                    conn.close()
+                    return
+                if op[0] == "flush":
+                    op[1].set()
+
+    def _apply(self, conn, op):
+        kind = op[0]
+        if kind == "visit":
+            _, url, title, visit_time = op
+            conn.execute(
+                """
+                INSERT INTO urls (url, title, visit_count, last_visit) VALUES (?, ?, 1, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    visit_count = visit_count + 1,
+                    last_visit = MAX(last_visit, excluded.last_visit),
+                    title = CASE WHEN excluded.title != '' THEN excluded.title ELSE title END
+                """,
+                (url, title, visit_time)
+            )
+            url_id = conn.execute("SELECT id FROM urls WHERE url = ?", (url,)).fetchone()[0]
+            conn.execute("INSERT INTO visits (url_id, visit_time) VALUES (?, ?)", (url_id, visit_time))
+            # Keep only the newest visits per URL; visit_count still holds the total
+            conn.execute(
+                """
+                DELETE FROM visits WHERE url_id = ? AND visit_time < (
+                    SELECT visit_time FROM visits WHERE url_id = ?
+                    ORDER BY visit_time DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                (url_id, url_id, HISTORY_VISITS_PER_URL - 1)
+            )
+        elif kind == "title":
+            conn.execute("UPDATE urls SET title = ? WHERE url = ? AND title != ?", (op[2], op[1], op[2]))
+        elif kind == "clear":
+            conn.execute("DELETE FROM visits")
+            conn.execute("DELETE FROM urls")
+        elif kind == "delete_range":
+            _, since, until = op
+            # visit_count is the total beyond the per-URL cap, so subtract rather than recount
+            conn.execute(
+                """
+                UPDATE urls SET visit_count = MAX(0, visit_count - (
+                    SELECT COUNT(*) FROM visits v
+                    WHERE v.url_id = urls.id AND v.visit_time >= ? AND v.visit_time < ?
+                ))
+                WHERE id IN (SELECT url_id FROM visits WHERE visit_time >= ? AND visit_time < ?)
+                """,
+                (since, until, since, until)
+            )
+            conn.execute("DELETE FROM visits WHERE visit_time >= ? AND visit_time < ?", (since, until))
+            conn.execute(
+                """
+                DELETE FROM urls WHERE last_visit >= ? AND last_visit < ?
+                AND NOT EXISTS (SELECT 1 FROM visits v WHERE v.url_id = urls.id)
+                """,
+                (since, until)
+            )
+            conn.execute(
+                """
+                UPDATE urls SET last_visit = (SELECT MAX(visit_time) FROM visits v WHERE v.url_id = urls.id)
+                WHERE last_visit >= ? AND last_visit < ?
+                """,
+                (since, until)
+            )
+
+    # Reads
+    def top_urls(self, limit):
+        """Most recently visited URLs with their visit counts, for the URL bar index"""
+        return self.conn.execute(
+            "SELECT url, title, visit_count, last_visit FROM urls ORDER BY last_visit DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def search(self, text, limit=100, before=None):
+        """Search titles and URLs, honouring time phrases like "last week"
+
+        before is the (visit_time, id) of the last row already shown, so
+        later pages are read with an index seek instead of an OFFSET scan.
+        """
+        words, since, until = parse_history_query(text)
+        params = []
+        conditions = []
+
+        if before is not None:
+            conditions.append("(u.last_visit, u.id) < (?, ?)")
+            params += list(before)
+
+        if since is not None and until is None:
+            conditions.append("u.last_visit >= ?")
+            params.append(since)
+        elif since is not None:
+            # A visit inside the range, not just a recent last visit
+            conditions.append(
+                "EXISTS (SELECT 1 FROM visits v WHERE v.url_id = u.id AND v.visit_time >= ? AND v.visit_time < ?)"
+            )
+            params += [since, until]
+
+        if words and self.has_fts:
+            sql = "SELECT u.id, u.url, u.title, u.visit_count, u.last_visit AS visit_time FROM urls_fts JOIN urls u ON u.id = urls_fts.rowid"
+            conditions.insert(0, "urls_fts MATCH ?")
+            params.insert(0, fts_query(words))
+        else:
+            sql = "SELECT u.id, u.url, u.title, u.visit_count, u.last_visit AS visit_time FROM urls u"
+            if words:
+                conditions.insert(0, "(u.title LIKE ? OR u.url LIKE ?)")
+                params[0:0] = [f"%{words}%", f"%{words}%"]
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY u.last_visit DESC, u.id DESC LIMIT ?"
+        params.append(limit)
+
+        try:
+            return self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+class BookmarkStore:
+    """Bookmarks indexed by URL, saved as a JSON snapshot plus an append-only journal
+
+    Each change appends one line to the journal instead of rewriting the
+    whole file; the journal is folded into the snapshot once it outgrows
+    both COMPACT_AFTER and the snapshot as last written, and when the store
+    closes. Journal operations are idempotent, so replaying one over a newer
+    snapshot is harmless.
+    """
+    COMPACT_AFTER = 500
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.bookmarks = {}  # url -> bookmark, in insertion order
+        self.journal_entries = 0
+        self.snapshot_entries = 0  # bookmarks in the snapshot file
+
+        # Search index (token -> urls, plus the sorted tokens for prefix lookups)
+        # and folder tree (path -> urls filed directly in it, path -> subfolder paths)
+        self.token_urls = {}
+        self.tokens = []
+        self.folders = {"": {}}
+        self.subfolders = {"": set()}
+
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    for bookmark in json.load(f):
+                        self.bookmarks[bookmark["url"]] = bookmark
+            self.snapshot_entries = len(self.bookmarks)
+        except:
+            pass
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                lines = f.readlines()
+            for line in lines:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    # Torn write from a crash: keep what replayed and start a clean journal
+                    self.compact()
+                    break
+                self.journal_entries += 1
+        elif not os.path.exists(self.path) and legacy_path and os.path.exists(legacy_path):
+            # One-time move from the old bookmarks.json in the working directory
+            try:
+                with open(legacy_path, "r") as f:
+                    for bookmark in json.load(f):
+                        self.bookmarks.setdefault(bookmark["url"], bookmark)
+                self.compact()
+            except:
+                pass
+
+        # compact() above may already have opened a fresh journal
+        if not getattr(self, "journal", None):
+            self.journal = open(self.journal_path, "a")
+
+        for bookmark in self.bookmarks.values():
+            self._index(bookmark, sort=False)
+        self.tokens.sort()
+
+    def __len__(self):
+        return len(self.bookmarks)
+
+    def __iter__(self):
+        return iter(list(self.bookmarks.values()))
+
+    def __contains__(self, url):
+        return url in self.bookmarks
+
+    def get(self, url):
+        return self.bookmarks.get(url)
+
+    def add(self, url, title, folder="", tags=(), **fields):
+        """Add a bookmark; returns None if the URL is already bookmarked"""
+        added = self.add_many([dict(fields, url=url, title=title, folder=folder, tags=list(tags))])
+        return added[0] if added else None
+
+    def add_many(self, bookmarks):
+        """Add bookmarks that are not there yet with one journal write; returns the added ones"""
+        added = []
+        for bookmark in bookmarks:
+            if bookmark["url"] not in self.bookmarks:
+                bookmark["folder"] = self.clean_folder(bookmark.get("folder", ""))
+                bookmark["tags"] = self.clean_tags(bookmark.get("tags", []))
+                self.bookmarks[bookmark["url"]] = bookmark
+                self._index(bookmark, sort=False)
+                added.append(bookmark)
+        if added:
+            self.tokens.sort()  # New tokens were appended; cheaper than insort per token
+        self._log([{"op": "add", "bookmark": bookmark} for bookmark in added])
+        return added
+
+    def update(self, url, **fields):
+        bookmark = self.bookmarks.get(url)
+        if bookmark is None:
+            return
+        if "folder" in fields:
+            fields["folder"] = self.clean_folder(fields["folder"])
+        if "tags" in fields:
+            fields["tags"] = self.clean_tags(fields["tags"])
+        self._unindex(bookmark)
+        bookmark.update(fields)
+        self._index(bookmark, sort=True)
+        self._log([{"op": "update", "url": url, "fields": fields}])
+
+    def remove(self, url):
+        bookmark = self.bookmarks.pop(url, None)
+        if bookmark is not None:
+            self._unindex(bookmark)
+            self._log([{"op": "remove", "url": url}])
+
+    # Folders, tags and search
+    @staticmethod
+    def clean_folder(folder):
+        """Normalize a folder path such as " Work / Docs/" to "Work/Docs" """
+        if not folder or (folder.strip(" /") == folder and "//" not in folder and " /" not in folder and "/ " not in folder):
+            return folder or ""
+        return "/".join(part.strip() for part in (folder or "").split("/") if part.strip())
+
+    @staticmethod
+    def clean_tags(tags):
+        seen = []
+        for tag in tags:
+            tag = tag.strip().lstrip("#").lower()
+            if tag and tag not in seen:
+                seen.append(tag)
+        return seen
+
+    def child_folders(self, folder):
+        """Paths of the folders directly inside folder, by name"""
+        return sorted(self.subfolders.get(folder, ()), key=str.lower)
+
+    def in_folder(self, folder):
+        """Bookmarks filed directly in folder, in the order they were added"""
+        return [self.bookmarks[url] for url in self.folders.get(folder, ())]
+
+    def search(self, text, limit=500):
+        """Bookmarks matching every word of text by prefix, in titles, URLs, tags and folders"""
+        matches = None
+        for word in re.findall(r"\w+", text.lower()):
+            urls = set()
+            i = bisect.bisect_left(self.tokens, word)
+            while i < len(self.tokens) and self.tokens[i].startswith(word):
+                urls |= self.token_urls[self.tokens[i]]
+                i += 1
+            matches = urls if matches is None else matches & urls
+            if not matches:
+                return []
+        if matches is None:
+            return []
+        return heapq.nsmallest(
+            limit, (self.bookmarks[url] for url in matches), key=lambda b: (b["title"] or b["url"]).lower()
+        )
+
+    def _words(self, bookmark):
+        address = bookmark["url"].split("://", 1)[-1]
+        text = " ".join([bookmark.get("title") or "", address, bookmark.get("folder", "")] + bookmark.get("tags", []))
+        return set(re.findall(r"\w+", text.lower()))
+
+    def _index(self, bookmark, sort):
+        url = bookmark["url"]
+        for word in self._words(bookmark):
+            urls = self.token_urls.get(word)
+            if urls is None:
+                urls = self.token_urls[word] = set()
+                if sort:
+                    bisect.insort(self.tokens, word)
+                else:
+                    self.tokens.append(word)
+            urls.add(url)
+
+        folder = bookmark.get("folder", "")
+        self._add_folder(folder)
+        self.folders[folder][url] = None
+
+    def _unindex(self, bookmark):
+        url = bookmark["url"]
+        for word in self._words(bookmark):
+            urls = self.token_urls.get(word)
+            if urls is None:
+                continue
+            urls.discard(url)
+            if not urls:
+                del self.token_urls[word]
+                i = bisect.bisect_left(self.tokens, word)
+                if i < len(self.tokens) and self.tokens[i] == word:
+                    del self.tokens[i]
+        self.folders.get(bookmark.get("folder", ""), {}).pop(url, None)
+
+    def _add_folder(self, folder):
+        while folder not in self.folders:
+            self.folders[folder] = {}
+            self.subfolders.setdefault(folder, set())
+            parent = folder.rsplit("/", 1)[0] if "/" in folder else ""
+            self.subfolders.setdefault(parent, set()).add(folder)
+            folder = parent
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot"""
+        write_json_atomic(self.path, list(self.bookmarks.values()))
+        if getattr(self, "journal", None):
+            self.journal.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal = open(self.journal_path, "a")
+        self.journal_entries = 0
+        self.snapshot_entries = len(self.bookmarks)
+
+    def close(self):
+        try:
+            if self.journal_entries:
+                self.compact()
+        except OSError:
+            pass  # The journal is replayed on the next start instead
+        self.journal.close()
+
+    def _log(self, ops):
+        if not ops:
+            return
+        self.journal.write("".join(json.dumps(op) + "\n" for op in ops))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.journal_entries += len(ops)
+        # Relative to the last snapshot, so bulk imports rewrite it a logarithmic number of times
+        if self.journal_entries >= max(self.COMPACT_AFTER, self.snapshot_entries):
+            self.compact()
+
+    def _apply(self, op):
+        if op["op"] == "add":
+            self.bookmarks.setdefault(op["bookmark"]["url"], op["bookmark"])
+        elif op["op"] == "update":
+            if op["url"] in self.bookmarks:
+                self.bookmarks[op["url"]].update(op["fields"])
+        elif op["op"] == "remove":
+            self.bookmarks.pop(op["url"], None)
+
+class NetscapeBookmarkParser(HTMLParser):
+    """Incremental parser for the Netscape bookmark HTML that browsers export
+
+    Feed it chunks; finished bookmarks collect in self.bookmarks for the
+    caller to drain. <H3> names the folder opened by the next <DL>.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.bookmarks = []
+        self.folders = []  # one entry per open <DL>, None for unnamed lists
+        self.pending_folder = None
+        self.text = None
+        self.link = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "dl":
+            self.folders.append(self.pending_folder)
+            self.pending_folder = None
+        elif tag == "h3":
+            self.text = []
+        elif tag == "a" and attrs.get("href"):
+            self.link = attrs
+            self.text = []
+
+    def handle_endtag(self, tag):
+        if tag == "dl" and self.folders:
+            self.folders.pop()
+        elif tag == "h3" and self.text is not None:
+            self.pending_folder = "".join(self.text).strip().replace("/", "-") or "Untitled"
+            self.text = None
+        elif tag == "a" and self.link is not None:
+            self._finish_link()
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        if self.link is not None:
+            self._finish_link()
+
+    def _finish_link(self):
+        url = self.link["href"]
+        if not url.startswith("place:"):  # Firefox smart folders
+            bookmark = {
+                "url": url,
+                "title": "".join(self.text).strip(),
+                "folder": "/".join(f for f in self.folders if f),
+                "tags": [t for t in (self.link.get("tags") or "").split(",") if t.strip()],
+            }
+            if (self.link.get("add_date") or "").isdigit():
+                bookmark["added"] = int(self.link["add_date"])
+            self.bookmarks.append(bookmark)
+        self.link = None
+        self.text = None
+
+def iter_json_objects(f):
+    """Yield the objects of a JSON array (or JSON lines) file without reading it all"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        chunk = f.read(BOOKMARK_IO_CHUNK)
+        buffer += chunk
+        pos = 0
+        while True:
+            # Skip the separators between top-level objects
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if not chunk:
+                    raise
+                break  # Object continues in the next chunk
+            if isinstance(obj, dict):
+                yield obj
+        buffer = buffer[pos:]
+        if not chunk:
+            return
+
+class BookmarkImportWorker(QThread):
+    """Parse a bookmark file in chunks and hand bookmarks over in batches"""
+    progress = pyqtSignal(int, int)
+    batch_ready = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            total = os.path.getsize(self.path)
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                if self.path.lower().endswith(".json"):
+                    self._read_json(f, total)
+                else:
+                    self._read_html(f, total)
+        except Exception as e:
+            if not self._cancelled:
+                self.failed.emit(str(e))
+
+    def _read_html(self, f, total):
+        parser = NetscapeBookmarkParser()
+        read = 0
+        while not self._cancelled:
+            chunk = f.read(BOOKMARK_IO_CHUNK)
+            if not chunk:
+                parser.close()
+            else:
+                parser.feed(chunk)
+                read += len(chunk)
+            if len(parser.bookmarks) >= BOOKMARK_IMPORT_BATCH or not chunk:
+                self.batch_ready.emit(parser.bookmarks)
+                parser.bookmarks = []
+            self.progress.emit(min(read, total), total)
+            if not chunk:
+                return
+
+    def _read_json(self, f, total):
+        batch = []
+        for obj in iter_json_objects(f):
+            if self._cancelled:
+                return
+            if isinstance(obj.get("url"), str):
+                bookmark = {
+                    "url": obj["url"],
+                    "title": str(obj.get("title") or ""),
+                    "folder": str(obj.get("folder") or ""),
+                    "tags": [str(t) for t in obj.get("tags") or []],
+                }
+                if isinstance(obj.get("added"), int):
+                    bookmark["added"] = obj["added"]
+                batch.append(bookmark)
+            if len(batch) >= BOOKMARK_IMPORT_BATCH:
+                self.batch_ready.emit(batch)
+                batch = []
+                self.progress.emit(min(f.tell(), total), total)
+        self.batch_ready.emit(batch)
+        self.progress.emit(total, total)
+
+class BookmarkExportWorker(QThread):
+    """Write bookmarks as Netscape HTML or JSON, swapping the file in when done"""
+    progress = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, bookmarks, path, parent=None):
+        super().__init__(parent)
+        self.bookmarks = bookmarks
+        self.path = path
+
+    def run(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if self.path.lower().endswith(".json"):
+                    self._write_json(f)
+                else:
+                    self._write_html(f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def _write_json(self, f):
+        f.write("[\n")
+        for i, bookmark in enumerate(self.bookmarks):
+            f.write((",\n" if i else "") + json.dumps(bookmark))
+            if i % BOOKMARK_IMPORT_BATCH == 0:
+                self.progress.emit(i, len(self.bookmarks))
+        f.write("\n]\n")
+        self.progress.emit(len(self.bookmarks), len(self.bookmarks))
+
+    def _write_html(self, f):
+        by_folder = {}
+        subfolders = {}
+        for bookmark in self.bookmarks:
+            folder = bookmark.get("folder", "")
+            by_folder.setdefault(folder, []).append(bookmark)
+            while folder:
+                parent = folder.rsplit("/", 1)[0] if "/" in folder else ""
+                subfolders.setdefault(parent, set()).add(folder)
+                folder = parent
+
+        f.write(
+            "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+            "<META HTTP-EQUIV=\"Content-Type\" CONTENT=\"text/html; charset=UTF-8\">\n"
+            "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n"
+        )
+        written = 0
+        # Depth-first with an explicit stack; ("end", indent) closes a folder's list
+        stack = [("folder", "", 0)]
+        while stack:
+            kind, folder, depth = stack.pop()
+            indent = "    " * depth
+            if kind == "end":
+                f.write(f"{indent}</DL><p>\n")
+                continue
+            if folder:
+                f.write(f"{indent}<DT><H3>{html.escape(folder.rsplit('/', 1)[-1])}</H3>\n")
+            f.write(f"{indent}<DL><p>\n")
+            for bookmark in by_folder.get(folder, []):
+                tags = ",".join(bookmark.get("tags", []))
+                f.write(
+                    f"{indent}    <DT><A HREF=\"{html.escape(bookmark['url'])}\""
+                    f" ADD_DATE=\"{bookmark.get('added', 0)}\""
+                    + (f" TAGS=\"{html.escape(tags)}\"" if tags else "")
+                    + f">{html.escape(bookmark.get('title') or '')}</A>\n"
+                )
+                written += 1
+                if written % BOOKMARK_IMPORT_BATCH == 0:
+                    self.progress.emit(written, len(self.bookmarks))
+            stack.append(("end", folder, depth))
+            for child in sorted(subfolders.get(folder, ()), reverse=True):
+                stack.append(("folder", child, depth + 1))
+        self.progress.emit(len(self.bookmarks), len(self.bookmarks))
+
+class OmniboxIndex:
+    """In-memory URL bar suggestions over history, bookmarks and open tabs
+
+    Entries are keyed by normalized URL. Every entry contributes sorted
+    (token, key) pairs for its host, host + path and title words, so a
+    keystroke is a bisect to the typed prefix followed by frecency
+    scoring of the matches. Prefixes that match many entries keep their
+    best few candidates, so short prefixes don't rescore every match.
+    """
+    URL_MATCH_BOOST = 2  # typing the start of a host beats a title word
+    BOOKMARK_BONUS = 150
+    OPEN_TAB_BONUS = 50
+    PREFIX_CANDIDATES = 64
+
+    def __init__(self):
+        self.entries = {}
+        self.tokens = []
+        self._top = {}  # prefix -> {key: url match} of its best candidates
+
+    def rebuild(self, history_rows, bookmarks):
+        """Reload history and bookmarks, keeping open tab counts"""
+        open_tabs = [(e["url"], e["title"], e["open_tabs"]) for e in self.entries.values() if e["open_tabs"]]
+        self.entries = {}
+        self.tokens = []
+        self._top = {}
+        for row in history_rows:
+            entry = self._entry(row["url"], row["title"])
+            entry["visits"] = row["visit_count"]
+            entry["last_visit"] = row["last_visit"]
+        for bookmark in bookmarks:
+            entry = self.entries.get(normalize_url(bookmark["url"]))
+            if entry is None:
+                entry = self._entry(bookmark["url"], bookmark.get("title", ""))
+            entry["bookmarked"] = True
+        # Open tabs outside the loaded history still count, so tab_moved can decrement them
+        for url, title, count in open_tabs:
+            self._entry(url, title)["open_tabs"] = count
+        self.tokens.sort()
+
+    # Incremental updates
+    def add_visit(self, url, title, visit_time=None):
+        entry = self._entry(url, title, sort=True)
+        entry["visits"] += 1
+        entry["last_visit"] = max(entry["last_visit"], visit_time or time.time())
+        self._promote(entry)
+
+    def set_title(self, url, title):
+        entry = self.entries.get(normalize_url(url))
+        if entry is not None and title and title != entry["title"]:
+            self._unindex(entry)
+            entry["title"] = title
+            self._index(entry, sort=True)
+
+    def set_bookmarked(self, url, title, bookmarked):
+        if bookmarked:
+            entry = self._entry(url, title, sort=True)
+            entry["bookmarked"] = True
+            self._promote(entry)
+        else:
+            entry = self.entries.get(normalize_url(url))
+            if entry is not None:
+                entry["bookmarked"] = False
+                self._drop_if_unused(entry)
+
+    def tab_moved(self, old_url, new_url):
+        """A tab navigated from old_url to new_url (either may be None)"""
+        if old_url:
+            entry = self.entries.get(normalize_url(old_url))
+            if entry is not None:
+                entry["open_tabs"] = max(0, entry["open_tabs"] - 1)
+                self._drop_if_unused(entry)
+        if new_url:
+            entry = self._entry(new_url, "", sort=True)
+            entry["open_tabs"] += 1
+            self._promote(entry)
+
+    # Lookup
+    def suggest(self, text, limit=OMNIBOX_SUGGESTIONS):
+        """Top suggestions for what the user typed, best first"""
+        words = text.lower().split()
+        if not words:
+            return []
+        prefix = self._strip_scheme(words[0])
+        rest = words[1:]
+        now = time.time()
+
+        top = self._top.get(prefix)
+        if top is not None:
+            # Rescore only the cached candidates; visits and age may have reordered them
+            ranked = self._rank(top.items(), now, self.PREFIX_CANDIDATES)
+            self._top[prefix] = dict(ranked)
+            found = [key for key, _ in ranked if self._has_words(key, rest)][:limit]
+            if len(found) == limit:
+                return [self.entries[key] for key in found]
+
+        matches = {}
+        i = bisect.bisect_left(self.tokens, (prefix,))
+        while i < len(self.tokens) and self.tokens[i][0].startswith(prefix):
+            _, is_title, key = self.tokens[i]
+            matches[key] = matches.get(key, False) or not is_title
+            i += 1
+        if len(matches) > self.PREFIX_CANDIDATES:
+            self._top[prefix] = dict(self._rank(matches.items(), now, self.PREFIX_CANDIDATES))
+
+        candidates = [(key, url_match) for key, url_match in matches.items() if self._has_words(key, rest)]
+        return [self.entries[key] for key, _ in self._rank(candidates, now, limit)]
+
+    def _rank(self, candidates, now, limit):
+        """The best (key, url match) pairs by frecency, most recent first on ties"""
+        scored = []
+        for key, url_match in candidates:
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            score = self.frecency(entry, now)
+            if url_match:
+                score *= self.URL_MATCH_BOOST
+            scored.append((score, entry["last_visit"], key, url_match))
+        return [(key, url_match) for _, _, key, url_match in heapq.nlargest(limit, scored)]
+
+    def _has_words(self, key, words):
+        haystack = self.entries[key]["haystack"] if key in self.entries else ""
+        return all(w in haystack for w in words)
+
+    def frecency(self, entry, now):
+        """Visit count weighted by how recently the URL was visited"""
+        age_days = (now - entry["last_visit"]) / 86400
+        if age_days < 4:
+            weight = 100
+        elif age_days < 14:
+            weight = 70
+        elif age_days < 31:
+            weight = 50
+        elif age_days < 90:
+            weight = 30
+        else:
+            weight = 10
+        score = entry["visits"] * weight
+        if entry["bookmarked"]:
+            score += self.BOOKMARK_BONUS
+        if entry["open_tabs"]:
+            score += self.OPEN_TAB_BONUS
+        return score
+
+    # Index maintenance
+    def _entry(self, url, title, sort=False):
+        key = normalize_url(url)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = {
+                "key": key, "url": url, "title": title or "", "visits": 0,
+                "last_visit": 0, "bookmarked": False, "open_tabs": 0,
+            }
+            self.entries[key] = entry
+            self._index(entry, sort)
+        elif title and title != entry["title"]:
+            self._unindex(entry)
+            entry["title"] = title
+            self._index(entry, sort)
+        return entry
+
+    def _drop_if_unused(self, entry):
+        if not (entry["visits"] or entry["bookmarked"] or entry["open_tabs"]):
+            self._unindex(entry)
+            del self.entries[entry["key"]]
+
+    def _index(self, entry, sort):
+        address = self._strip_scheme(entry["key"])
+        tokens = {(address, False), (address[4:], False)} if address.startswith("www.") else {(address, False)}
+        tokens |= {(word, True) for word in re.findall(r"\w{2,}", entry["title"].lower())}
+        entry["tokens"] = [(token, is_title, entry["key"]) for token, is_title in tokens]
+        entry["haystack"] = f"{entry['title'].lower()} {address}"
+        for token in entry["tokens"]:
+            if sort:
+                bisect.insort(self.tokens, token)
+            else:
+                self.tokens.append(token)
+        if sort:
+            self._promote(entry)
+
+    def _unindex(self, entry):
+        for token in entry["tokens"]:
+            i = bisect.bisect_left(self.tokens, token)
+            if i < len(self.tokens) and self.tokens[i] == token:
+                del self.tokens[i]
+            for prefix in self._cached_prefixes(token[0]):
+                self._top[prefix].pop(entry["key"], None)
+
+    def _promote(self, entry):
+        """Offer an entry whose tokens or score changed to the cached prefixes it matches"""
+        for token, is_title, key in entry["tokens"]:
+            for prefix in self._cached_prefixes(token):
+                top = self._top[prefix]
+                top[key] = top.get(key, False) or not is_title
+                if len(top) > 2 * self.PREFIX_CANDIDATES:
+                    self._top[prefix] = dict(self._rank(top.items(), time.time(), self.PREFIX_CANDIDATES))
+
+    def _cached_prefixes(self, token):
+        return [token[:n] for n in range(1, len(token) + 1) if token[:n] in self._top]
+
+    def _strip_scheme(self, url):
+        return url.split("://", 1)[1] if "://" in url else url
+
+class ChatWorker(QThread):
+    """Background worker that streams an AI response off the GUI thread"""
+    token_received = pyqtSignal(str)
+    response_finished = pyqtSignal(str)
+    response_failed = pyqtSignal(str)
+
+    def __init__(self, synth, messages, use_cache=True, parent=None):
+        super().__init__(parent)
+        self.synth = synth
+        self.messages = messages
+        self.use_cache = use_cache
+        self._cancelled = False
+
+    def cancel(self):
+        """Ask the worker to stop; the pending network call is abandoned"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def summarize(self, summary, messages):
+        """Summarize folded turns, giving up as soon as the worker is cancelled"""
+        return self.synth.summarize_messages(summary, messages, self.is_cancelled)
+
+    def run(self):
+        chunks = []
+        info = {}
+        cache = self.synth.response_cache
+        try:
+            context = self.synth.context_window.build(self.messages, self.summarize)
+
+            if self.use_cache:
+                cached = cache.lookup(context, [spec["model"] for spec in AI_MODELS])
+                if cached is not None:
+                    self.token_received.emit(cached)
+                    self.response_finished.emit(cached)
+                    return
+
+            for delta in self.synth.stream_response(context, self.is_cancelled, info):
+                if self._cancelled:
+                    return
+                chunks.append(delta)
+                self.token_received.emit(delta)
+        except Exception as e:
+            if not self._cancelled:
+                self.response_failed.emit(str(e))
+            return
+
+        if not self._cancelled:
+            response = "".join(chunks)
+            if response and info.get("model"):
+                cache.store(context, info["model"], response)
+            self.response_finished.emit(response)
+
+class HttpClient:
+    """Shared keep-alive HTTP client with retries, streamed downloads and metrics"""
+    def __init__(self, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, pool_size=HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Synth Browser"
+
+        # Retry connection errors and transient server errors with backoff
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.metrics = {}
+
+    def request(self, method, url, **kwargs):
+        """Send a request on the pooled session and record its metrics"""
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            self._record(url, time.monotonic() - started, 0, error=True)
+            raise
+
+        # Streamed bodies are counted by download() as they are read
+        size = 0 if kwargs.get("stream") else len(response.content)
+        self._record(url, time.monotonic() - started, size, error=response.status_code >= 400)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def download(self, url, path, progress=None, is_cancelled=lambda: False, chunk_size=64 * 1024):
+        """Stream a response body to path; return its SHA-256, or None if cancelled"""
+        part_path = f"{path}.part"
+        started = time.monotonic()
+        received = 0
+        try:
+            with self.get(url, stream=True) as response:
+                response.raise_for_status()
+                total = int(response.headers.get("Content-Length") or 0)
+                content_hash = hashlib.sha256()
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size):
+                        if is_cancelled():
+                            return None
+                        f.write(chunk)
+                        content_hash.update(chunk)
+                        received += len(chunk)
+                        if progress:
+                            progress(received, total)
+
+            os.replace(part_path, path)
+            return content_hash.hexdigest()
+        finally:
+            self._record(url, time.monotonic() - started, received, count=False)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def stats(self):
+        """Return per-host request metrics, one line per host"""
+        with self._lock:
+            lines = []
+            for host, m in sorted(self.metrics.items()):
+                average = m["seconds"] / m["requests"] * 1000 if m["requests"] else 0
+                lines.append(
+                    f"{host}: {m['requests']} requests, {m['errors']} errors, "
+                    f"{m['bytes'] / (1024 * 1024):.1f} MB, avg {average:.0f} ms"
+                )
+            return "\n".join(lines) or "No requests yet"
+
+    def _record(self, url, seconds, size, error=False, count=True):
+        host = urlsplit(url).netloc or url
+        with self._lock:
+            m = self.metrics.setdefault(host, {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0})
+            if count:
+                m["requests"] += 1
+                m["seconds"] += seconds
+            m["errors"] += int(error)
+            m["bytes"] += size
+
+class ImageWorker(QThread):
+    """Background job that generates an image and streams it to disk"""
+    progress = pyqtSignal(str, int, int)
+    image_ready = pyqtSignal(str, str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, prompt, path, http, parent=None):
+        super().__init__(parent)
+        self.prompt = prompt
+        self.path = path
+        self.http = http
+        self._cancelled = False
+
+    def cancel(self):
+        """Stop at the next chunk; the partial file is discarded"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        try:
+            self.progress.emit("Requesting image...", 0, 0)
+            image_url = self.http.get_json(
+                "https://hercai.onrender.com/prodia/text2image",
+                params={"prompt": self.prompt}
+            )["url"]
+            if self._cancelled:
+                return
+
+            self.progress.emit("Downloading image...", 0, 0)
+            content_hash = self.http.download(
+                image_url,
+                self.path,
+                progress=lambda received, total: self.progress.emit("Downloading image...", received, total),
+                is_cancelled=self.is_cancelled
+            )
+            if content_hash and not self._cancelled:
+                self.image_ready.emit(self.path, content_hash)
+        except Exception as e:
+            if not self._cancelled:
+                self.failed.emit(str(e))
+
+class ImageStore:
+    """Content-addressed store of generated images with an LRU disk budget"""
+    def __init__(self, directory, max_bytes=IMAGE_STORE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+
+        self.index = {"prompts": {}, "images": {}}
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r") as f:
+                    self.index = json.load(f)
+        except:
+            pass
+
+        # Reverse of index["prompts"], so forgetting an image doesn't scan every prompt
+        self.hash_prompts = {}
+        for key, content_hash in self.index["prompts"].items():
+            self.hash_prompts.setdefault(content_hash, set()).add(key)
+        # Access times changed by lookups since the index was last written
+        self._dirty = False
+
+        # Downloads interrupted by a previous exit
+        for entry in os.scandir(directory):
+            if entry.name.startswith("incoming-"):
+                os.remove(entry.path)
+
+    @staticmethod
+    def prompt_key(prompt):
+        return hashlib.sha256(" ".join(prompt.lower().split()).encode("utf-8")).hexdigest()
+
+    def incoming_path(self):
+        """Return a fresh path for a download in progress"""
+        return os.path.join(self.directory, f"incoming-{uuid.uuid4().hex}")
+
+    def path(self, content_hash):
+        return os.path.join(self.directory, self.index["images"][content_hash]["file"])
+
+    def lookup(self, prompt):
+        """Return the stored image path for a prompt, or None"""
+        content_hash = self.index["prompts"].get(self.prompt_key(prompt))
+        if content_hash not in self.index["images"]:
+            return None
+
+        path = self.path(content_hash)
+        if not os.path.exists(path):
+            self._forget(content_hash)
+            self._dirty = True
+            return None
+
+        # Kept in memory; written with the next add or on close
+        self.index["images"][content_hash]["last_access"] = time.time()
+        self._dirty = True
+        return path
+
+    def add(self, prompt, incoming_path, content_hash):
+        """Move a finished download into the store and return its final path"""
+        image_format = bytes(QImageReader.imageFormat(incoming_path)).decode() or "png"
+        file_name = f"{content_hash}.{image_format}"
+        final_path = os.path.join(self.directory, file_name)
+
+        # Identical bytes are stored once, whatever prompt produced them
+        if os.path.exists(final_path):
+            os.remove(incoming_path)
+        else:
+            os.replace(incoming_path, final_path)
+
+        now = time.time()
+        entry = self.index["images"].setdefault(content_hash, {
+            "file": file_name,
+            "prompt": prompt,
+            "created": now,
+            "size": os.path.getsize(final_path),
+        })
+        entry["last_access"] = now
+        key = self.prompt_key(prompt)
+        previous = self.index["prompts"].get(key)
+        if previous is not None and previous != content_hash:
+            self.hash_prompts.get(previous, set()).discard(key)
+        self.index["prompts"][key] = content_hash
+        self.hash_prompts.setdefault(content_hash, set()).add(key)
+
+        self.evict(keep=content_hash)
+        self.save()
+        return final_path
+
+    def entries(self, limit=None):
+        """Return (path, metadata) pairs, newest first"""
+        images = sorted(self.index["images"].items(), key=lambda item: item[1]["created"], reverse=True)
+        return [(self.path(content_hash), entry) for content_hash, entry in images[:limit]]
+
+    def evict(self, keep=None):
+        """Delete least recently used images until the store fits its budget"""
+        total = sum(entry["size"] for entry in self.index["images"].values())
+        by_access = sorted(self.index["images"].items(), key=lambda item: item[1]["last_access"])
+        for content_hash, entry in by_access:
+            if total <= self.max_bytes:
+                break
+            if content_hash == keep:
+                continue
+            total -= entry["size"]
+            try:
+                os.remove(self.path(content_hash))
+            except OSError:
+                pass
+            self._forget(content_hash)
+
+    def save(self):
+        try:
+            write_json_atomic(self.index_path, self.index)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def close(self):
+        """Write access times recorded since the last save"""
+        if self._dirty:
+            self.save()
+
+    def _forget(self, content_hash):
+        self.index["images"].pop(content_hash, None)
+        for key in self.hash_prompts.pop(content_hash, ()):
+            self.index["prompts"].pop(key, None)
+
+class ImageLoadTask(QRunnable):
+    """Decode an image at display size on a pool thread"""
+    def __init__(self, loader, key, path, size):
+        super().__init__()
+        self.loader = loader
+        self.key = key
+        self.path = path
+        self.size = size
+
+    def run(self):
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(True)
+        # Let the decoder skip pixels we would throw away (JPEG decodes at reduced scale)
+        original = reader.size()
+        if original.isValid():
+            reader.setScaledSize(original.scaled(self.size, Qt.KeepAspectRatio))
+        self.loader.image_decoded.emit(self.key, reader.read())
+
+class ImageLoader(QObject):
+    """Load images scaled to display size off the GUI thread, cached in QPixmapCache"""
+    image_decoded = pyqtSignal(str, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._callbacks = {}
+        self.image_decoded.connect(self._on_decoded)
+
+    def load(self, path, size, callback):
+        """Call callback with a QPixmap of path fitted into size"""
+        key = f"{path}@{size.width()}x{size.height()}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            callback(pixmap)
+            return
+
+        # Coalesce requests for an image that is already being decoded
+        if key in self._callbacks:
+            self._callbacks[key].append(callback)
+            return
+        self._callbacks[key] = [callback]
+        QThreadPool.globalInstance().start(ImageLoadTask(self, key, path, size))
+
+    def _on_decoded(self, key, image):
+        # QPixmap must be created on the GUI thread
+        callbacks = self._callbacks.pop(key, [])
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, pixmap)
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # The target widget was closed before the image arrived
+                pass
+
+class ImageBatchQueue(QObject):
+    """Run many image prompts with bounded concurrency and retries with backoff"""
+    job_updated = pyqtSignal(int)
+    all_done = pyqtSignal()
+
+    def __init__(self, store, http, max_concurrency=IMAGE_BATCH_CONCURRENCY,
+                 max_retries=IMAGE_BATCH_RETRIES, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.http = http
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.jobs = []
+        self._pending = []
+        self._workers = {}
+        self._retrying = set()
+        self._cancelled = False
+
+    def add(self, prompts):
+        """Queue prompts and start as many jobs as the limit allows"""
+        self._cancelled = False
+        for prompt in prompts:
+            self.jobs.append({"prompt": prompt, "status": "Queued", "attempts": 0, "path": None})
+            self._pending.append(len(self.jobs) - 1)
+        self._pump()
+
+    def cancel(self):
+        """Drop queued jobs and stop running ones"""
+        was_running = self.is_running()
+        self._cancelled = True
+        for index in self._pending:
+            self._set_status(index, "Cancelled")
+        self._pending.clear()
+
+        # Jobs waiting out a retry backoff
+        for index in self._retrying:
+            self._set_status(index, "Cancelled")
+        self._retrying.clear()
+
+        for index, worker in list(self._workers.items()):
+            worker.cancel()
+            worker.progress.disconnect()
+            worker.image_ready.disconnect()
+            worker.failed.disconnect()
+            self._set_status(index, "Cancelled")
+        self._workers.clear()
+        if was_running:
+            self.all_done.emit()
+
+    def is_running(self):
+        return bool(self._pending or self._workers or self._retrying)
+
+    def set_concurrency(self, value):
+        """Change the parallel job limit, starting more jobs if it grew"""
+        self.max_concurrency = value
+        if self._pending:
+            self._pump()
+
+    def _pump(self):
+        while self._pending and len(self._workers) < self.max_concurrency:
+            self._start(self._pending.pop(0))
+
+        if not self.is_running():
+            self.all_done.emit()
+
+    def _start(self, index):
+        job = self.jobs[index]
+
+        cached_path = self.store.lookup(job["prompt"])
+        if cached_path:
+            job["path"] = cached_path
+            self._set_status(index, "Done")
+            return
+
+        job["attempts"] += 1
+        self._set_status(index, "Requesting...")
+
+        worker = ImageWorker(job["prompt"], self.store.incoming_path(), self.http, self)
+        worker.progress.connect(
+            lambda stage, received, total, index=index: self._on_progress(index, received, total)
+        )
+        worker.image_ready.connect(
+            lambda path, content_hash, index=index: self._on_ready(index, path, content_hash)
+        )
+        worker.failed.connect(lambda error, index=index: self._on_failed(index, error))
+        worker.finished.connect(worker.deleteLater)
+        self._workers[index] = worker
+        worker.start()
+
+    def _on_progress(self, index, received, total):
+        if total > 0:
+            self._set_status(index, f"Downloading {received * 100 // total}%")
+        elif received:
+            self._set_status(index, f"Downloading {received // 1024} KB")
+
+    def _on_ready(self, index, path, content_hash):
+        self._workers.pop(index, None)
+        job = self.jobs[index]
+        job["path"] = self.store.add(job["prompt"], path, content_hash)
+        self._set_status(index, "Done")
+        self._pump()
+
+    def _on_failed(self, index, error):
+        self._workers.pop(index, None)
+        job = self.jobs[index]
+
+        if job["attempts"] <= self.max_retries and not self._cancelled:
+            delay = 2 ** job["attempts"]
+            self._set_status(index, f"Retrying in {delay}s")
+            self._retrying.add(index)
+            QTimer.singleShot(delay * 1000, lambda: self._retry(index))
+        else:
+            self._set_status(index, f"Failed: {error}")
+        self._pump()
+
+    def _retry(self, index):
+        if index not in self._retrying:
+            return
+        self._retrying.discard(index)
+        self._pending.insert(0, index)
+        self._pump()
+
+    def _set_status(self, index, status):
+        self.jobs[index]["status"] = status
+        self.job_updated.emit(index)
+
+class LRUCache:
+    """Small least-recently-used cache"""
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._entries.pop(key, default)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class ChatMessageModel(QAbstractListModel):
+    """List model over a window of chat messages; pages load on scroll at either end"""
+    MessageRole = Qt.UserRole + 1
+    PAGE_SIZE = 50
+    MAX_ROWS = 400
+
+    def __init__(self, load_older, load_newer, parent=None):
+        super().__init__(parent)
+        self.load_older = load_older
+        self.load_newer = load_newer
+        self.messages = []
+        self.has_older = False
+        self.has_newer = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message["content"]
+        if role == self.MessageRole:
+            return message
+        return None
+
+    def set_messages(self, messages, has_older):
+        """Replace the loaded window"""
+        self.beginResetModel()
+        self.messages = list(messages)
+        self.has_older = has_older
+        self.has_newer = False
+        self.endResetModel()
+
+    def append_message(self, message):
+        """Add a message at the bottom, dropping the oldest rows past MAX_ROWS"""
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append(message)
+        self.endInsertRows()
+        self.trim_head()
+
+    def trim_head(self):
+        """Drop the oldest rows past MAX_ROWS"""
+        overflow = len(self.messages) - self.MAX_ROWS
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.messages[:overflow]
+            self.endRemoveRows()
+            self.has_older = True
+
+    def trim_tail(self):
+        """Drop the newest stored rows past MAX_ROWS"""
+        overflow = len(self.messages) - self.MAX_ROWS
+        if overflow <= 0:
+            return
+        # Rows that only exist in the transcript (a streaming reply, errors) stay at the bottom
+        end = self.stored_end()
+        start = max(end - overflow, 0)
+        if start < end:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            del self.messages[start:end]
+            self.endRemoveRows()
+            self.has_newer = True
+
+    def stored_end(self):
+        """Row after the newest stored message"""
+        end = len(self.messages)
+        while end and self.messages[end - 1].get("transient"):
+            end -= 1
+        return end
+
+    def replace_message(self, old, new):
+        """Swap a row's message in place, or remove the row if new is None"""
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row] is not old:
+                continue
+            if new is None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.messages[row]
+                self.endRemoveRows()
+            else:
+                self.messages[row] = new
+                index = self.index(row, 0)
+                self.dataChanged.emit(index, index)
+            return
+
+    def fetch_older(self, count):
+        """Prepend up to count older messages and return how many were added"""
+        before_id = next((m["id"] for m in self.messages if not m.get("transient")), None)
+        older = self.load_older(before_id, count) if before_id else []
+        if not older:
+            self.has_older = False
+            return 0
+
+        self.beginInsertRows(QModelIndex(), 0, len(older) - 1)
+        self.messages[0:0] = older
+        self.endInsertRows()
+        self.has_older = len(older) == count
+        self.trim_tail()
+        return len(older)
+
+    def fetch_newer(self, count):
+        """Load up to count newer messages after a trimmed tail and return how many were added"""
+        row = self.stored_end()
+        after_id = self.messages[row - 1]["id"] if row else None
+        newer = self.load_newer(after_id, count) if after_id else []
+        if len(newer) < count:
+            self.has_newer = False
+        if not newer:
+            return 0
+
+        self.beginInsertRows(QModelIndex(), row, row + len(newer) - 1)
+        self.messages[row:row] = newer
+        self.endInsertRows()
+        self.trim_head()
+        return len(newer)
+
+class HistoryModel(QAbstractListModel):
+    """Lazily paged history rows for the current filter, with a header row per day"""
+    EntryRole = Qt.UserRole + 1
+    PAGE_SIZE = 200
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.filter_text = ""
+        self.rows = []
+        self.cursor = None
+        self.has_more = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            if row["kind"] == "day":
+                return row["label"]
+            visited = time.strftime("%H:%M", time.localtime(row["visit_time"]))
+            visits = row["visit_count"]
+            return f"{visited}  ·  {row['title'] or row['url']}\n{row['url']}  ·  {visits} visit{'s' if visits != 1 else ''}"
+        if role == Qt.FontRole and row["kind"] == "day":
+            font = QFont()
+            font.setBold(True)
+            return font
+        if role == Qt.ToolTipRole and row["kind"] == "visit":
+            return row["url"]
+        if role == self.EntryRole:
+            return row
+        return None
+
+    def flags(self, index):
+        if index.isValid() and self.rows[index.row()]["kind"] == "day":
+            return Qt.ItemIsEnabled
+        return super().flags(index)
+
+    def set_filter(self, text):
+        """Restart paging for a new search; an empty filter lists everything"""
+        self.beginResetModel()
+        self.filter_text = text.strip()
+        self.rows = []
+        self.cursor = None
+        self.has_more = True
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def refresh(self):
+        self.set_filter(self.filter_text)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.has_more:
+            return
+        entries = self.history.search(self.filter_text, self.PAGE_SIZE, self.cursor)
+        self.has_more = len(entries) == self.PAGE_SIZE
+        if not entries:
+            return
+
+        last_day = next((r["day"] for r in reversed(self.rows) if r["kind"] == "day"), None)
+        new_rows = []
+        for entry in entries:
+            day = datetime.fromtimestamp(entry["visit_time"]).date()
+            if day != last_day:
+                new_rows.append({"kind": "day", "day": day, "label": self.day_label(day)})
+                last_day = day
+            new_rows.append(dict(entry, kind="visit"))
+        self.cursor = (entries[-1]["visit_time"], entries[-1]["id"])
+
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+        self.rows.extend(new_rows)
+        self.endInsertRows()
+
+    def day_label(self, day):
+        today = datetime.now().date()
+        if day == today:
+            return "Today"
+        if day == today - timedelta(days=1):
+            return "Yesterday"
+        return day.strftime("%A, %d %B %Y")
+
+class BookmarkTreeModel(QAbstractItemModel):
+    """Bookmark folders as a tree whose folders load their contents when expanded
+
+    With a filter set the tree is replaced by a flat list of search matches.
+    """
+    BookmarkRole = Qt.UserRole + 1
+    FolderRole = Qt.UserRole + 2
+    COLUMNS = ("Name", "URL")
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.filter_text = ""
+        self.root = self._folder_node("", None, 0)
+
+    def _folder_node(self, path, parent, row):
+        return {"kind": "folder", "path": path, "name": path.rsplit("/", 1)[-1], "parent": parent, "row": row, "children": None}
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        children = self._node(parent)["children"] or []
+        if not 0 <= row < len(children) or not 0 <= column < len(self.COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer()["parent"]
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent["row"], 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent)["children"] or [])
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        if node["kind"] != "folder" or parent.column() > 0:
+            return False
+        # Unloaded folders show an expander until fetchMore fills them
+        return node["children"] is None or bool(node["children"])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        node = self._node(parent)
+        return node["kind"] == "folder" and node["children"] is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        node = self._node(parent)
+        if node["kind"] != "folder" or node["children"] is not None:
+            return
+        if node is self.root and self.filter_text:
+            folders, bookmarks = [], self.store.search(self.filter_text)
+        else:
+            folders, bookmarks = self.store.child_folders(node["path"]), self.store.in_folder(node["path"])
+
+        children = [self._folder_node(path, node, row) for row, path in enumerate(folders)]
+        children += [
+            {"kind": "bookmark", "bookmark": bookmark, "parent": node, "row": len(folders) + row}
+            for row, bookmark in enumerate(bookmarks)
+        ]
+        if not children:
+            node["children"] = []
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        node["children"] = children
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        bookmark = node.get("bookmark")
+        if role == Qt.DisplayRole:
+            if bookmark is None:
+                return node["name"] if index.column() == 0 else ""
+            if index.column() == 1:
+                return bookmark["url"]
+            tags = " ".join(f"#{tag}" for tag in bookmark.get("tags", []))
+            title = bookmark["title"] or bookmark["url"]
+            return f"{title}  {tags}" if tags else title
+        if role == Qt.DecorationRole and index.column() == 0:
+            return qta.icon("fa5s.folder" if bookmark is None else "fa5s.bookmark")
+        if role == Qt.ToolTipRole and bookmark is not None:
+            return bookmark["url"]
+        if role == self.BookmarkRole:
+            return bookmark
+        if role == self.FolderRole:
+            return node["path"] if bookmark is None else None
+        return None
+
+    def shown_bookmarks(self, index):
+        """Bookmarks an "Open all" on index covers: a folder's, or every search match"""
+        if self.filter_text:
+            return self.store.search(self.filter_text)
+        folder = index.data(self.FolderRole) if index.isValid() else None
+        if folder is None:
+            bookmark = index.data(self.BookmarkRole) if index.isValid() else None
+            folder = bookmark.get("folder", "") if bookmark else ""
+        return self.store.in_folder(folder)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def set_filter(self, text):
+        """Show search matches for text, or the folder tree when text is empty"""
+        self.beginResetModel()
+        self.filter_text = text.strip()
+        self.root = self._folder_node("", None, 0)
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def refresh(self):
+        self.set_filter(self.filter_text)
+
+class ChatBubbleDelegate(QStyledItemDelegate):
+    """Lay out and paint chat bubbles from cached HTML"""
+    def __init__(self, panel):
+        super().__init__(panel)
+        self.panel = panel
+        self._documents = LRUCache(200)
+        self._heights = LRUCache(5000)
+
+    def document(self, html, width, cache=True):
+        """Return a laid out document for the bubble HTML"""
+        key = (html, width)
+        document = self._documents.get(key) if cache else None
+        if document is None:
+            document = QTextDocument()
+            document.setHtml(html)
+            document.setTextWidth(width)
+            if cache:
+                self._documents.put(key, document)
+        return document
+
+    def sizeHint(self, option, index):
+        message = index.data(ChatMessageModel.MessageRole)
+        width = self.panel.chat_output.viewport().width()
+        html = self.panel.message_html(message)
+        # The streaming bubble changes on every repaint, so it is never cached
+        cache = message["id"] is not None
+        height = self._heights.get((html, width)) if cache else None
+        if height is None:
+            height = int(math.ceil(self.document(html, width, cache).size().height()))
+            if cache:
+                self._heights.put((html, width), height)
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        message = index.data(ChatMessageModel.MessageRole)
+        width = self.panel.chat_output.viewport().width()
+        html = self.panel.message_html(message)
+        document = self.document(html, width, message["id"] is not None)
+
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        document.drawContents(painter, QRectF(0, 0, option.rect.width(), option.rect.height()))
+        painter.restore()
+
+class ResponseCache:
+    """Two-tier (memory LRU + size-capped disk) cache of AI responses with TTLs"""
+    def __init__(self, directory, max_entries=RESPONSE_CACHE_ENTRIES,
+                 max_disk_bytes=RESPONSE_CACHE_DISK_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def key(self, messages, model):
+        """Hash the normalized conversation and model name"""
+        normalized = [
+            {"role": m["role"], "content": " ".join(m["content"].split())}
+            for m in messages
+        ]
+        payload = json.dumps([model, normalized], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, messages, models):
+        """Return a fresh cached response for any of the models, or None"""
+        with self._lock:
+            now = time.time()
+            for model in models:
+                key = self.key(messages, model)
+
+                entry = self._memory.get(key)
+                if entry is not None:
+                    if entry["expires"] > now:
+                        self.memory_hits += 1
+                        return entry["content"]
+                    self._memory.pop(key)
+
+                entry = self._read_disk(key)
+                if entry is not None:
+                    if entry["expires"] > now:
+                        self.disk_hits += 1
+                        self._memory.put(key, entry)
+                        return entry["content"]
+                    self._remove_disk(key)
+
+            self.misses += 1
+            return None
+
+    def store(self, messages, model, content, ttl=None):
+        """Cache a response in both tiers"""
+        key = self.key(messages, model)
+        entry = {
+            "model": model,
+            "content": content,
+            "expires": time.time() + (ttl if ttl is not None else self.ttl),
+        }
+        with self._lock:
+            self._memory.put(key, entry)
+            try:
+                path = self._path(key)
+                self._remove_disk(key)
+                write_json_atomic(path, entry)
+                self._disk_bytes += os.path.getsize(path)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    def stats(self):
+        """Return a one-line summary of cache effectiveness"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hit_rate = (self.memory_hits + self.disk_hits) / lookups * 100 if lookups else 0
+        return (
+            f"{self.memory_hits} memory hits, {self.disk_hits} disk hits, {self.misses} misses "
+            f"({hit_rate:.0f}% hit rate), {len(self._memory)} in memory, "
+            f"{self._disk_bytes / (1024 * 1024):.1f} MB on disk"
+        )
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            # Touch the file so disk eviction is least-recently-used
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _remove_disk(self, key):
+        path = self._path(key)
+        try:
+            self._disk_bytes -= os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Drop the least recently used files until under 90% of the budget"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
 class ChatSlidePanel(QWidget):
     """Slide-out chat panel from the right side"""
     def __init__(self, parent=None):
@@ -43,6 +2745,21 @@ class ChatSlidePanel(QWidget):
         self.parent_window = parent
         self.is_open = False
         self.setFixedWidth(480)
+
+        # Streaming state
+        self.worker = None
+        self._stream_text = ""
+        self._stream_message = None
+        self._stream_timer = QTimer(self)
+        self._stream_timer.setSingleShot(True)
+        self._stream_timer.setInterval(50)
+        self._stream_timer.timeout.connect(self.render_stream)
+
+        # Rendered bubble HTML by (message id, theme, accent) and markdown by message id
+        self.bubble_cache = LRUCache(1000)
+        self.markdown_cache = LRUCache(1000)
+        self._rendered_signature = None
+
         self.setup_ui()
 
     def setup_ui(self):
@@ -60,6 +2777,29 @@ class ChatSlidePanel(QWidget):
         header_title = QLabel("AI Assistant")
         header_title.setStyleSheet("font-size: 18px; font-weight: 600;")
 
+        # Session picker
+        self.session_combo = QComboBox()
+        self.session_combo.setObjectName("chatSessionCombo")
+        self.session_combo.setMinimumWidth(160)
+        self.session_combo.activated.connect(self.on_session_selected)
+        self.session_combo.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.session_combo.customContextMenuRequested.connect(self.show_session_menu)
+
+        new_session_btn = QPushButton("+")
+        new_session_btn.setObjectName("chatCloseButton")
+        new_session_btn.setToolTip("New chat")
+        new_session_btn.setFixedSize(32, 32)
+        new_session_btn.setCursor(Qt.PointingHandCursor)
+        new_session_btn.clicked.connect(self.new_session)
+
+        search_btn = QPushButton()
+        search_btn.setIcon(qta.icon("fa5s.search"))
+        search_btn.setObjectName("chatCloseButton")
+        search_btn.setToolTip("Search conversations")
+        search_btn.setFixedSize(32, 32)
+        search_btn.setCursor(Qt.PointingHandCursor)
+        search_btn.clicked.connect(self.open_search)
+
         close_btn = QPushButton("✕")
         close_btn.setObjectName("chatCloseButton")
         close_btn.setFixedSize(32, 32)
@@ -68,12 +2808,31 @@ class ChatSlidePanel(QWidget):
 
         header_layout.addWidget(header_title)
         header_layout.addStretch()
+        header_layout.addWidget(self.session_combo)
+        header_layout.addWidget(new_session_btn)
+        header_layout.addWidget(search_btn)
         header_layout.addWidget(close_btn)
 
-        # Chat display area
-        self.chat_output = QTextEdit()
-        self.chat_output.setReadOnly(True)
+        # Chat display area: only the visible bubbles are laid out and painted
+        self.message_model = ChatMessageModel(
+            self.parent_window.chat_messages_before, self.parent_window.chat_messages_after, self
+        )
+        self.chat_output = QListView()
         self.chat_output.setObjectName("chatOutput")
+        self.chat_output.setModel(self.message_model)
+        delegate = ChatBubbleDelegate(self)
+        self.chat_output.setItemDelegate(delegate)
+        # A replaced or streaming bubble can change height; dataChanged alone only repaints
+        self.message_model.dataChanged.connect(lambda top, bottom: delegate.sizeHintChanged.emit(top))
+        self.chat_output.setSelectionMode(QAbstractItemView.NoSelection)
+        self.chat_output.setFocusPolicy(Qt.NoFocus)
+        self.chat_output.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chat_output.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.chat_output.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.chat_output.setResizeMode(QListView.Adjust)
+        self.chat_output.setLayoutMode(QListView.Batched)
+        self.chat_output.setBatchSize(50)
+        self.chat_output.verticalScrollBar().valueChanged.connect(self.on_transcript_scrolled)
 
         # Input area
         input_container = QWidget()
@@ -91,14 +2850,23 @@ class ChatSlidePanel(QWidget):
         self.input_edit.setMinimumHeight(44)
         self.input_edit.returnPressed.connect(self.send_message)
 
-        send_btn = QPushButton("Send")
-        send_btn.setObjectName("chatSendButton")
-        send_btn.setCursor(Qt.PointingHandCursor)
-        send_btn.setFixedSize(80, 44)
-        send_btn.clicked.connect(self.send_message)
+        self.send_btn = QPushButton("Send")
+        self.send_btn.setObjectName("chatSendButton")
+        self.send_btn.setCursor(Qt.PointingHandCursor)
+        self.send_btn.setFixedSize(80, 44)
+        self.send_btn.clicked.connect(self.send_message)
+
+        # Stop button replaces Send while a response is streaming
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setObjectName("chatStopButton")
+        self.stop_btn.setCursor(Qt.PointingHandCursor)
+        self.stop_btn.setFixedSize(80, 44)
+        self.stop_btn.clicked.connect(self.stop_generation)
+        self.stop_btn.hide()
 
         message_input_layout.addWidget(self.input_edit)
-        message_input_layout.addWidget(send_btn)
+        message_input_layout.addWidget(self.send_btn)
+        message_input_layout.addWidget(self.stop_btn)
 
         # Clear chat button
         clear_btn = QPushButton("Clear Chat")
@@ -107,7 +2875,12 @@ class ChatSlidePanel(QWidget):
         clear_btn.setMinimumHeight(36)
         clear_btn.clicked.connect(self.clear_chat)
 
+        # Bypass the response cache for the next message
+        self.fresh_checkbox = QCheckBox("Fresh answer (skip cache)")
+        self.fresh_checkbox.setObjectName("chatFreshCheckbox")
+
         input_layout.addLayout(message_input_layout)
+        input_layout.addWidget(self.fresh_checkbox)
         input_layout.addWidget(clear_btn)
 
         # Add all to main layout
@@ -127,6 +2900,7 @@ class ChatSlidePanel(QWidget):
 
     def open_panel(self):
         """Open the chat panel"""
+        self.refresh_sessions()
         self.show()
         self.is_open = True
         # Focus on input
@@ -137,45 +2911,277 @@ class ChatSlidePanel(QWidget):
         self.is_open = False
         self.hide()
 
+    def refresh_sessions(self):
+        """Fill the session picker, selecting the current session"""
+        self.session_combo.clear()
+        # A new chat is only stored once it has a message
+        if self.parent_window.chat_session_id is None:
+            self.session_combo.addItem("New chat", None)
+        for session in self.parent_window.chat_store.sessions():
+            self.session_combo.addItem(session["name"], session["id"])
+            if session["id"] == self.parent_window.chat_session_id:
+                self.session_combo.setCurrentIndex(self.session_combo.count() - 1)
+
+    def on_session_selected(self, index):
+        """Switch to the session picked in the combo box"""
+        session_id = self.session_combo.itemData(index)
+        if session_id is not None and session_id != self.parent_window.chat_session_id:
+            self.open_session(session_id)
+
+    def open_session(self, session_id):
+        """Show another session in the transcript"""
+        self.stop_generation()
+        self.parent_window.switch_chat_session(session_id)
+        self.load_history()
+        self.refresh_sessions()
+
+    def show_session_menu(self, pos):
+        """Context menu for the current session"""
+        session_id = self.parent_window.chat_session_id
+        if session_id is None:
+            return
+
+        menu = QMenu(self)
+        rename_action = menu.addAction("Rename Chat")
+        delete_action = menu.addAction("Delete Chat")
+        chosen = menu.exec_(self.session_combo.mapToGlobal(pos))
+        if chosen == rename_action:
+            self.rename_session(session_id)
+        elif chosen == delete_action:
+            self.delete_session(session_id)
+
+    def rename_session(self, session_id):
+        name, ok = QInputDialog.getText(
+            self, "Rename Chat", "Name:", text=self.session_combo.currentText()
+        )
+        if ok and name.strip():
+            self.parent_window.chat_store.rename_session(session_id, name.strip())
+            self.refresh_sessions()
+
+    def delete_session(self, session_id):
+        reply = QMessageBox.question(
+            self, "Delete Chat",
+            f"Delete \"{self.session_combo.currentText()}\" and all its messages?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+
+        self.stop_generation()
+        store = self.parent_window.chat_store
+        store.delete_session(session_id)
+        self.parent_window.switch_chat_session(store.latest_session())
+        self.load_history()
+        self.refresh_sessions()
+
+    def new_session(self):
+        """Start a new conversation"""
+        self.stop_generation()
+        self.parent_window.new_chat_session()
+        self.load_history()
+        self.refresh_sessions()
+        self.input_edit.setFocus()
+
+    def open_search(self):
+        """Search past conversations"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Search Conversations")
+        dialog.setMinimumSize(560, 420)
+
+        layout = QVBoxLayout(dialog)
+
+        search_edit = QLineEdit()
+        search_edit.setPlaceholderText("Search all conversations...")
+        search_edit.setObjectName("chatInput")
+        layout.addWidget(search_edit)
+
+        results = QListWidget()
+        results.setObjectName("historyList")
+        layout.addWidget(results)
+
+        def run_search(text):
+            results.clear()
+            for row in self.parent_window.chat_store.search(text):
+                item = QListWidgetItem(f"{row['session_name']}\n{row['role']}: {row['snippet']}")
+                item.setData(Qt.UserRole, row["session_id"])
+                results.addItem(item)
+
+        def open_result(item):
+            self.open_session(item.data(Qt.UserRole))
+            dialog.close()
+
+        search_edit.textChanged.connect(run_search)
+        results.itemDoubleClicked.connect(open_result)
+
+        dialog.exec_()
+
     def send_message(self):
         """Send message to AI"""
         prompt = self.input_edit.text().strip()
-        if not prompt:
+        if not prompt or self.is_generating():
             return
 
+        # Scrolled back past MAX_ROWS: jump to the newest page before adding to it
+        if self.message_model.has_newer:
+            self.reload_transcript()
+
         # Add user message
-        self.parent_window.chat_history.append({
-            "role": "user",
-            "content": prompt
-        })
-        self.apply_styles(prompt, role="user")
+        message = self.record_message("user", prompt)
+        self.show_message(message)
 
         self.input_edit.clear()
 
-        # Generate AI response
-        try:
-            ai_response = self.parent_window.generate_response(prompt)
-            self.parent_window.chat_history.append({
-                "role": "assistant",
-                "content": ai_response
-            })
-            self.apply_styles(ai_response, role="assistant")
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
-            self.apply_styles(error_msg, role="error")
+        # Stream AI response from a background worker
+        self.worker = ChatWorker(
+            self.parent_window,
+            list(self.parent_window.chat_history),
+            use_cache=not self.fresh_checkbox.isChecked(),
+            parent=self
+        )
+        # Skipping the cache applies to this message only
+        self.fresh_checkbox.setChecked(False)
+        self.worker.token_received.connect(self.on_token)
+        self.worker.response_finished.connect(self.on_response_finished)
+        self.worker.response_failed.connect(self.on_response_failed)
+        self.worker.finished.connect(self.worker.deleteLater)
+
+        self.begin_stream()
+        self.worker.start()
+
+    def is_generating(self):
+        """Return True while a response is streaming"""
+        return self.worker is not None
+
+    def begin_stream(self):
+        """Add the placeholder bubble that streamed tokens are rendered into"""
+        self._stream_text = ""
+        self._stream_message = {"id": None, "role": "assistant", "content": "", "transient": True}
+        self.show_message(self._stream_message)
+
+        self.send_btn.hide()
+        self.stop_btn.show()
+
+    def end_stream(self):
+        """Detach the worker and restore the input controls"""
+        if self.worker is not None:
+            self.worker.token_received.disconnect(self.on_token)
+            self.worker.response_finished.disconnect(self.on_response_finished)
+            self.worker.response_failed.disconnect(self.on_response_failed)
+            self.worker = None
+
+        self._stream_timer.stop()
+        self._stream_message = None
+        self._stream_text = ""
+
+        self.stop_btn.hide()
+        self.send_btn.show()
+
+    def on_token(self, delta):
+        """Buffer a token delta and schedule a repaint of the streaming bubble"""
+        self._stream_text += delta
+        if not self._stream_timer.isActive():
+            self._stream_timer.start()
+
+    def render_stream(self):
+        """Re-render the streaming bubble with the text received so far"""
+        if self._stream_message is None:
+            return
+
+        at_bottom = self.is_scrolled_to_bottom()
+        self._stream_message["content"] = self._stream_text
+        self.message_model.replace_message(self._stream_message, self._stream_message)
+        if at_bottom:
+            self.chat_output.scrollToBottom()
+
+    def on_response_finished(self, ai_response):
+        """Commit the streamed response to history"""
+        message = self.record_message("assistant", ai_response)
+        self.message_model.replace_message(self._stream_message, message)
+        self.end_stream()
+
+    def on_response_failed(self, error):
+        """Show a streaming error in place of the response"""
+        self.message_model.replace_message(self._stream_message, self.error_message(error))
+        self.end_stream()
+
+    def stop_generation(self):
+        """Cancel the streaming response, keeping whatever already arrived"""
+        if not self.is_generating():
+            return
+
+        self.worker.cancel()
+        partial = self._stream_text
+        message = self.record_message("assistant", partial) if partial else None
+        self.message_model.replace_message(self._stream_message, message)
+        self.end_stream()
 
     def clear_chat(self):
         """Clear chat history"""
+        self.stop_generation()
         self.parent_window.chat_history.clear()
-        self.chat_output.clear()
-
-    def apply_styles(self, message, role):
-        """Apply styles to chat messages"""
-        # Convert markdown to HTML
-        message_html = markdown2.markdown(message)
+        self.parent_window.chat_store.clear_session(self.parent_window.chat_session_id)
+        self.parent_window.context_window.reset()
+        self.message_model.set_messages([], has_older=False)
+        self.mark_rendered()
+
+    def error_message(self, error):
+        """Build a transcript-only error message"""
+        return {"id": uuid.uuid4().hex, "role": "error", "content": f"Error: {error}", "transient": True}
+
+    def show_message(self, message):
+        """Append a message bubble to the transcript and scroll to it"""
+        self.message_model.append_message(message)
+        self.chat_output.scrollToBottom()
+
+    def is_scrolled_to_bottom(self):
+        scroll_bar = self.chat_output.verticalScrollBar()
+        return scroll_bar.value() >= scroll_bar.maximum() - 4
+
+    def on_transcript_scrolled(self, value):
+        """Load the adjacent page of messages when scrolled to the top or bottom"""
+        scroll_bar = self.chat_output.verticalScrollBar()
+        if value == scroll_bar.minimum() and self.message_model.has_older:
+            added = self.message_model.fetch_older(ChatMessageModel.PAGE_SIZE)
+            if added:
+                # Keep the message that was at the top in place
+                self.chat_output.scrollTo(self.message_model.index(added, 0), QAbstractItemView.PositionAtTop)
+        elif value == scroll_bar.maximum() and self.message_model.has_newer:
+            row = self.message_model.stored_end() - 1
+            anchor = self.message_model.messages[row] if row >= 0 else None
+            self.message_model.fetch_newer(ChatMessageModel.PAGE_SIZE)
+            # Keep the message that was at the bottom in place
+            if anchor is not None:
+                row = self.message_model.messages.index(anchor)
+                self.chat_output.scrollTo(self.message_model.index(row, 0), QAbstractItemView.PositionAtBottom)
+
+    def message_html(self, message):
+        """Return bubble HTML for a transcript row"""
+        if message is self._stream_message:
+            return self.bubble_html(message["content"] or "…", message["role"])
+        return self.bubble_html(message["content"], message["role"], message["id"])
+
+    def bubble_html(self, message, role, message_id=None):
+        """Return bubble HTML, reusing cached renders for stored messages"""
         accent = getattr(self.parent_window, "accent_color", "#5B9CF6")
         dark = getattr(self.parent_window, "dark_mode", False)
 
+        if message_id is None:
+            return self.render_bubble(markdown2.markdown(message), role, accent, dark)
+
+        # Only user bubbles use the accent color, so other entries survive accent changes
+        key = (message_id, role, dark, accent if role == "user" else None)
+        html = self.bubble_cache.get(key)
+        if html is None:
+            message_html = self.markdown_cache.get(message_id)
+            if message_html is None:
+                message_html = markdown2.markdown(message)
+                self.markdown_cache.put(message_id, message_html)
+            html = self.render_bubble(message_html, role, accent, dark)
+            self.bubble_cache.put(key, html)
+        return html
+
+    def render_bubble(self, message_html, role, accent, dark):
+        """Wrap rendered markdown in a styled chat bubble"""
         def hex_to_rgba(hex_color, alpha):
             """Convert #rrggbb to rgba string for inline styling."""
             hex_color = hex_color.lstrip("#")
@@ -205,8 +3211,7 @@ class ChatSlidePanel(QWidget):
         text_color = "#e9edf7" if dark else "#0f1629"
         shadow_alpha = 0.18 if dark else 0.08
 
-        self.chat_output.append(
-            f"""
+        return f"""
             <div style="
                 margin: 10px 6px 12px;
                 padding: 12px 14px;
@@ -223,31 +3228,79 @@ class ChatSlidePanel(QWidget):
                 </div>
             </div>
             """
-        )
 
-        # Scroll to bottom
-        self.chat_output.verticalScrollBar().setValue(
-            self.chat_output.verticalScrollBar().maximum()
+    def history_signature(self):
+        """Identify what a full render of the history would look like"""
+        history = self.parent_window.chat_history
+        return (
+            len(history),
+            history[-1]["id"] if history else None,
+            getattr(self.parent_window, "dark_mode", False),
+            getattr(self.parent_window, "accent_color", "#5B9CF6"),
         )
 
+    def mark_rendered(self):
+        """Record that the transcript matches the current history"""
+        self._rendered_signature = self.history_signature()
+
+    def record_message(self, role, content):
+        """Add a message shown live in the transcript to the history"""
+        in_sync = self._rendered_signature == self.history_signature()
+        message = self.parent_window.add_chat_message(role, content)
+        if in_sync:
+            self.mark_rendered()
+        return message
+
     def load_history(self):
         """Load chat history into the panel"""
-        self.chat_output.clear()
-        for message in self.parent_window.chat_history:
-            self.apply_styles(message["content"], role=message["role"])
+        # Nothing changed since the panel was last shown: keep the transcript as is
+        if self._rendered_signature == self.history_signature():
+            return
+        self.reload_transcript()
+
+    def reload_transcript(self):
+        """Show the newest page of the chat history"""
+        history = self.parent_window.chat_history
+        page_size = ChatMessageModel.PAGE_SIZE
+        # Older messages may be in the session store even if they are not in memory
+        self.message_model.set_messages(history[-page_size:], has_older=bool(history))
+        self.mark_rendered()
+
+        # Keep a response that is still streaming at the bottom
+        if self._stream_message is not None:
+            self.message_model.append_message(self._stream_message)
+
+        self.chat_output.scrollToBottom()
 
 class BrowserTab(QWidget):
-    """Individual browser tab widget"""
-    def __init__(self, parent=None):
+    """Individual browser tab widget
+
+    Starts as a placeholder holding only a URL and title; the web view is
+    created the first time the tab is shown. The view's signals are
+    re-emitted from the tab so they can be connected before it exists.
+    """
+    urlChanged = pyqtSignal(QUrl)
+    titleChanged = pyqtSignal(str)
+    loadStarted = pyqtSignal()
+    loadFinished = pyqtSignal(bool)
+
+    def __init__(self, url="https://www.google.com", title="New Tab", parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
 
-        # Browser view - fully opaque
-        self.browser = QWebEngineView()
-        self.browser.setUrl(QUrl("https://www.google.com"))
-        self.browser.setStyleSheet("QWebEngineView { background-color: white; border-radius: 8px; }")
-        self.layout.addWidget(self.browser)
+        # Browser view, created by ensure_browser
+        self.browser = None
+        self.pending_url = QUrl(url)
+        self.pending_title = title
+
+        # Hibernation: when the tab was last current, and what a discard saved
+        self.last_activated = time.monotonic()
+        self.hidden_since = None
+        self.pinned = False
+        self.saved_history = None
+        self.saved_scroll = None
+        self.saved_zoom = 1.0
 
         # Progress bar
         self.progress_bar = QProgressBar()
@@ -256,11 +3309,188 @@ class BrowserTab(QWidget):
         self.progress_bar.setTextVisible(False)
         self.progress_bar.setMaximumHeight(4)
         self.progress_bar.setStyleSheet("")
+        self.progress_bar.hide()
         self.layout.addWidget(self.progress_bar)
 
-        # Connect signals
-        self.browser.loadProgress.connect(self.update_progress)
-        self.browser.loadFinished.connect(self.load_finished)
+        # History visit waiting for the URL to settle (redirects, fragment changes)
+        self.pending_visit = None
+        self.last_visit_url = None
+        self.open_url = None  # URL counted as an open tab in the URL bar index
+        self.history_timer = QTimer(self)
+        self.history_timer.setSingleShot(True)
+        self.history_timer.setInterval(int(HISTORY_SETTLE_DELAY * 1000))
+
+    def showEvent(self, event):
+        self.hidden_since = None
+        if self.browser is None:
+            self.ensure_browser()
+        else:
+            self.set_frozen(False)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.hidden_since = time.monotonic()
+        super().hideEvent(event)
+
+    def ensure_browser(self):
+        """Create the web view on first use and load the tab's URL"""
+        if self.browser is None:
+            # Browser view - fully opaque
+            self.browser = QWebEngineView()
+            self.browser.setStyleSheet("QWebEngineView { background-color: white; border-radius: 8px; }")
+            self.layout.insertWidget(0, self.browser)
+
+            # Connect signals
+            self.browser.urlChanged.connect(self.urlChanged)
+            self.browser.titleChanged.connect(self.titleChanged)
+            self.browser.loadStarted.connect(self.loadStarted)
+            self.browser.loadFinished.connect(self.loadFinished)
+            self.browser.loadProgress.connect(self.update_progress)
+            self.browser.loadFinished.connect(self.load_finished)
+
+            if self.saved_history is not None:
+                # Coming back from a discard: the history stream reloads the current entry
+                QDataStream(self.saved_history, QIODevice.ReadOnly) >> self.browser.history()
+                self.saved_history = None
+                self.browser.loadFinished.connect(self.restore_view_state)
+            else:
+                self.browser.setUrl(self.pending_url)
+        return self.browser
+
+    def load(self, url):
+        """Navigate to url, or remember it until the view exists"""
+        if self.browser is None and self.saved_history is None:
+            self.pending_url = QUrl(url)
+            if self.isVisible():
+                self.ensure_browser()
+        else:
+            self.ensure_browser().setUrl(QUrl(url))
+
+    # Hibernation
+    @property
+    def discarded(self):
+        return self.browser is None and self.saved_history is not None
+
+    def render_pid(self):
+        """PID of the renderer process, if this Qt can tell"""
+        if self.browser is None or not hasattr(self.browser.page(), "renderProcessPid"):
+            return None
+        return self.browser.page().renderProcessPid() or None
+
+    def can_discard(self):
+        return self.browser is not None and not self.pinned and not self.is_audible()
+
+    def is_audible(self):
+        return self.browser is not None and self.browser.page().recentlyAudible()
+
+    # Lifecycle (Qt 5.14+); older Qt keeps every page active
+    def supports_lifecycle(self):
+        return self.browser is not None and hasattr(self.browser.page(), "setLifecycleState")
+
+    def is_frozen(self):
+        return self.supports_lifecycle() and self.browser.page().lifecycleState() == QWebEnginePage.LifecycleState.Frozen
+
+    def set_frozen(self, frozen):
+        if not self.supports_lifecycle():
+            return
+        state = QWebEnginePage.LifecycleState.Frozen if frozen else QWebEnginePage.LifecycleState.Active
+        if self.browser.page().lifecycleState() != state:
+            self.browser.page().setLifecycleState(state)
+
+    def freeze_if_idle(self):
+        """Freeze the page unless it is shown, pinned, playing audio or holds unsaved form input"""
+        if (self.hidden_since is None or self.pinned or self.is_audible()
+                or not self.supports_lifecycle() or self.is_frozen()):
+            return
+        if self.browser.page().recommendedState() == QWebEnginePage.LifecycleState.Active:
+            return  # e.g. DevTools attached
+
+        def finish(dirty):
+            if not dirty and self.browser is not None and self.hidden_since is not None:
+                self.set_frozen(True)
+
+        self.browser.page().runJavaScript(FORM_DIRTY_SCRIPT, finish)
+
+    def discard(self):
+        """Destroy the web view, keeping URL, title, navigation history, scroll and zoom"""
+        if self.browser is None:
+            return
+
+        def finish(scroll):
+            if self.browser is None or self.isVisible():
+                return  # Already discarded, or shown again meanwhile
+            data = QByteArray()
+            QDataStream(data, QIODevice.WriteOnly) << self.browser.history()
+            self.saved_history = data
+            self.saved_scroll = scroll if isinstance(scroll, list) and len(scroll) == 2 else None
+            self.saved_zoom = self.browser.zoomFactor()
+            self.pending_url = self.browser.url()
+            self.pending_title = self.browser.title()
+
+            self.layout.removeWidget(self.browser)
+            self.browser.deleteLater()
+            self.browser = None
+            self.progress_bar.hide()
+
+        # A frozen page runs no JavaScript, so wake it to read the scroll position
+        self.set_frozen(False)
+        self.browser.page().runJavaScript("[window.scrollX, window.scrollY]", finish)
+
+    def snapshot(self):
+        """URL, title, serialized navigation history and zoom; enough to rebuild the tab"""
+        if self.browser is not None:
+            history = QByteArray()
+            QDataStream(history, QIODevice.WriteOnly) << self.browser.history()
+            zoom = self.browser.zoomFactor()
+        else:
+            history, zoom = self.saved_history, self.saved_zoom
+        return {
+            "url": self.url().toString(),
+            "title": self.title(),
+            "history": history,
+            "zoom": zoom,
+            "pinned": self.pinned,
+        }
+
+    def restore_snapshot(self, state):
+        """Load a snapshot into a tab whose view hasn't been created yet"""
+        self.pending_url = QUrl(state["url"])
+        self.pending_title = state["title"]
+        self.saved_history = state.get("history")
+        self.saved_zoom = state.get("zoom", 1.0)
+        self.pinned = state.get("pinned", False)
+
+    def teardown(self):
+        """Disconnect everything and delete the view now, so its renderer exits"""
+        self.history_timer.stop()
+        for signal in (self.urlChanged, self.titleChanged, self.loadStarted, self.loadFinished,
+                       self.history_timer.timeout):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass  # Nothing connected
+        if self.browser is not None:
+            self.browser.stop()
+            self.layout.removeWidget(self.browser)
+            self.browser.deleteLater()
+            self.browser = None
+        self.saved_history = None
+        self.deleteLater()
+
+    def restore_view_state(self, ok):
+        """Put scroll position and zoom back after the first load following a discard"""
+        self.browser.loadFinished.disconnect(self.restore_view_state)
+        self.browser.setZoomFactor(self.saved_zoom)
+        if self.saved_scroll:
+            x, y = (int(v) for v in self.saved_scroll)
+            self.browser.page().runJavaScript(f"window.scrollTo({x}, {y});")
+        self.saved_scroll = None
+
+    def url(self):
+        return self.browser.url() if self.browser is not None else QUrl(self.pending_url)
+
+    def title(self):
+        return self.browser.title() if self.browser is not None else self.pending_title
 
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
@@ -270,6 +3500,92 @@ class BrowserTab(QWidget):
     def load_finished(self):
         self.progress_bar.hide()
 
+class TabManager(QObject):
+    """Background tab upkeep: freezes tabs hidden for freeze_delay seconds and discards
+    the least recently used ones when renderers outgrow a memory budget"""
+    def __init__(self, tabs, budget_mb=TAB_MEMORY_BUDGET_MB, freeze_delay=TAB_FREEZE_DELAY, parent=None):
+        super().__init__(parent)
+        self.tabs = tabs
+        self.budget_mb = budget_mb
+        self.freeze_delay = freeze_delay
+        self.discards = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(TAB_MEMORY_CHECK_INTERVAL * 1000)
+        self.timer.timeout.connect(self.freeze_idle_tabs)
+        self.timer.timeout.connect(self.enforce_budget)
+        self.timer.start()
+
+    def tab_activated(self, browser_tab):
+        browser_tab.last_activated = time.monotonic()
+
+    def freeze_idle_tabs(self):
+        """Freeze pages that have been hidden for longer than freeze_delay"""
+        now = time.monotonic()
+        for i in range(self.tabs.count()):
+            browser_tab = self.tabs.widget(i)
+            if browser_tab.hidden_since is not None and now - browser_tab.hidden_since >= self.freeze_delay:
+                browser_tab.freeze_if_idle()
+
+    def tab_memory(self):
+        """Estimated private MB per live tab; tabs sharing a renderer split its memory"""
+        usage = {}
+        by_pid = {}
+        for i in range(self.tabs.count()):
+            browser_tab = self.tabs.widget(i)
+            if browser_tab.browser is None:
+                continue
+            pid = browser_tab.render_pid()
+            if pid:
+                by_pid.setdefault(pid, []).append(browser_tab)
+            else:
+                usage[browser_tab] = TAB_ESTIMATED_MB
+
+        for pid, group in by_pid.items():
+            private = process_private_mb(pid)
+            total = private if private is not None else TAB_ESTIMATED_MB * len(group)
+            for browser_tab in group:
+                usage[browser_tab] = total / len(group)
+        return usage
+
+    def enforce_budget(self):
+        """Discard background tabs, oldest first, until usage fits the budget
+
+        A renderer shared by several tabs only exits with the last of them,
+        so tabs are discarded per renderer, and only when every tab using it
+        can be discarded.
+        """
+        usage = self.tab_memory()
+        total = sum(usage.values())
+        groups = {}
+        for browser_tab in usage:
+            groups.setdefault(browser_tab.render_pid() or browser_tab, []).append(browser_tab)
+
+        current = self.tabs.currentWidget()
+        candidates = sorted(
+            (group for group in groups.values()
+             if all(t is not current and t.can_discard() for t in group)),
+            key=lambda group: max(t.last_activated for t in group)
+        )
+        for group in candidates:
+            if total <= self.budget_mb:
+                break
+            for browser_tab in group:
+                browser_tab.discard()
+                total -= usage[browser_tab]
+                self.discards += 1
+        return total
+
+    def summary(self):
+        usage = self.tab_memory()
+        tabs = [self.tabs.widget(i) for i in range(self.tabs.count())]
+        discarded = sum(1 for t in tabs if t.discarded)
+        frozen = sum(1 for t in tabs if t.is_frozen())
+        return (
+            f"{len(usage)} live tabs using ~{sum(usage.values()):.0f} MB of {self.budget_mb} MB, "
+            f"{frozen} frozen, {discarded} discarded ({self.discards} discards this session)"
+        )
+
 class Synth(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -286,20 +3602,32 @@ class Synth(QMainWindow):
         # Tab orientation
         self.vertical_tabs = False
 
+        # Previous session, restored by setup_ui
+        self.session_path = app_data_path("session.json")
+        self.last_session = None
+        session = self.load_session()
+        if session:
+            self.dark_mode = bool(session.get("dark_mode", False))
+            self.vertical_tabs = bool(session.get("vertical_tabs", False))
+
         # Accent color from webpage
         self.accent_color = "#5B9CF6"  # Default blue
 
         # Data storage
-        self.bookmarks = self.load_bookmarks()
-        self.history_list = []
+        self.bookmarks = BookmarkStore(app_data_path("bookmarks.json"), legacy_path="bookmarks.json")
+        self.history = HistoryStore(app_data_path("history.db"))
+        self.omnibox = OmniboxIndex()
 
         # Browser compatibility helpers
         self.configure_web_engine()
 
         # Setup UI
-        self.setup_ui()
+        self.setup_ui(session)
         self.apply_theme()
 
+        # Fill the URL bar index once the window is up
+        QTimer.singleShot(0, self.rebuild_omnibox)
+
     def configure_web_engine(self):
         """Set modern UA and inject polyfills so newer sites run correctly."""
         profile = QWebEngineProfile.defaultProfile()
@@ -392,7 +3720,7 @@ class Synth(QMainWindow):
         profile.scripts().insert(polyfill_script)
         self._polyfills_installed = True
 
-    def setup_ui(self):
+    def setup_ui(self, session=None):
         """Setup the main UI"""
         # Central widget
         central_widget = QWidget()
@@ -446,6 +3774,18 @@ class Synth(QMainWindow):
         self.url_bar.setObjectName("urlBar")
         self.url_bar.returnPressed.connect(self.navigate_to_url)
 
+        # Suggestions from history, bookmarks and open tabs; the popup
+        # shows titles and inserts the URL (UserRole)
+        self.url_suggestions = QStandardItemModel(self)
+        self.url_completer = QCompleter(self.url_suggestions, self)
+        self.url_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.url_completer.setCompletionRole(Qt.UserRole)
+        self.url_completer.setMaxVisibleItems(OMNIBOX_SUGGESTIONS)
+        self.url_bar.setCompleter(self.url_completer)
+        self.url_bar.textEdited.connect(self.update_url_suggestions)
+        # Enter already triggers returnPressed; a click only activates the completer
+        self.url_completer.popup().clicked.connect(lambda index: self.navigate_to_url())
+
         # Action buttons
         self.bookmark_btn = self.create_icon_button("fa5s.star", "Add bookmark")
         self.bookmarks_btn = self.create_icon_button("fa5s.book", "View bookmarks")
@@ -501,8 +3841,16 @@ class Synth(QMainWindow):
         self.tabs.setDocumentMode(True)
         self.tabs.setTabsClosable(True)
         self.tabs.setMovable(True)
+        if self.vertical_tabs:
+            self.tabs.setTabPosition(QTabWidget.West)
         self.tabs.tabCloseRequested.connect(self.close_tab)
         self.tabs.currentChanged.connect(self.current_tab_changed)
+        self.tab_manager = TabManager(self.tabs, parent=self)
+        self.closed_tabs = deque(maxlen=CLOSED_TABS_LIMIT)
+
+        # Right-click a tab to pin it or close it
+        self.tabs.tabBar().setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tabs.tabBar().customContextMenuRequested.connect(self.show_tab_menu)
 
         # Center align tab text
         self.tabs.tabBar().setExpanding(False)
@@ -537,11 +3885,24 @@ class Synth(QMainWindow):
         self.ai_image_btn.clicked.connect(self.open_image_window)
         self.settings_btn.clicked.connect(self.open_settings)
 
-        # Chat history
-        self.chat_history = []
+        # Chat history: the newest page of the current session, older pages stay on disk
+        self.chat_store = ChatSessionStore(app_data_path("chat.db"))
+        self.context_window = ContextWindow()
+        self.switch_chat_session(self.chat_store.latest_session())
 
         # Initialize g4f client for AI chat
         self.g4f_client = g4f.Client()
+        self.provider_health = ProviderHealth(app_data_path("provider_health.json"))
+        self.ai_race = ProviderRace(self.g4f_client, self.provider_health)
+        self.response_cache = ResponseCache(app_data_path("response_cache"))
+
+        # Shared HTTP client for AI endpoints
+        self.http = HttpClient()
+
+        # Generated images
+        self.image_store = ImageStore(app_data_path("images"))
+        self.image_loader = ImageLoader(self)
+        QPixmapCache.setCacheLimit(IMAGE_PIXMAP_CACHE_KB)
 
         # Keyboard shortcuts
         self.setup_shortcuts()
@@ -551,8 +3912,15 @@ class Synth(QMainWindow):
         self.chat_panel.hide()
         content_layout.addWidget(self.chat_panel)
 
-        # Create initial tab
-        self.add_new_tab()
+        # Restore the previous session, or start with one tab
+        if not self.restore_session(session):
+            self.add_new_tab()
+
+        # Snapshot the session periodically so a crash loses little
+        self.session_timer = QTimer(self)
+        self.session_timer.setInterval(SESSION_SAVE_INTERVAL * 1000)
+        self.session_timer.timeout.connect(self.save_session)
+        self.session_timer.start()
 
     def setup_shortcuts(self):
         """Setup keyboard shortcuts"""
@@ -568,6 +3936,10 @@ class Synth(QMainWindow):
         close_tab_shortcut = QShortcut(QKeySequence.Close, self)
         close_tab_shortcut.activated.connect(lambda: self.close_tab(self.tabs.currentIndex()))
 
+        # Ctrl+Shift+T to reopen the last closed tab
+        reopen_tab_shortcut = QShortcut(QKeySequence("Ctrl+Shift+T"), self)
+        reopen_tab_shortcut.activated.connect(self.reopen_closed_tab)
+
         # Ctrl+L to focus URL bar
         focus_url_shortcut = QShortcut(QKeySequence("Ctrl+L"), self)
         focus_url_shortcut.activated.connect(lambda: self.url_bar.setFocus())
@@ -614,63 +3986,122 @@ class Synth(QMainWindow):
         btn.setObjectName("newTabButton")
         return btn
 
-    def add_new_tab(self, url="https://www.google.com", label="New Tab"):
-        """Add a new browser tab"""
+    def add_new_tab(self, url="https://www.google.com", label="New Tab", background=False, state=None):
+        """Add a new browser tab; background tabs stay placeholders until first shown
+
+        state is a BrowserTab.snapshot() to rebuild, history included.
+        """
+        if state is not None:
+            url, label = state["url"], state["title"] or "New Tab"
         if isinstance(url, bool) or not url:
             url = "https://www.google.com"
 
-        browser_tab = BrowserTab(self)
+        browser_tab = BrowserTab(url, label, self)
+        if state is not None:
+            browser_tab.restore_snapshot(state)
 
         # Connect signals
-        browser_tab.browser.urlChanged.connect(
+        browser_tab.urlChanged.connect(
             lambda qurl, browser_tab=browser_tab: self.update_url(qurl, browser_tab)
         )
-        browser_tab.browser.titleChanged.connect(
+        browser_tab.titleChanged.connect(
             lambda title, browser_tab=browser_tab: self.update_title(title, browser_tab)
         )
-        browser_tab.browser.loadStarted.connect(self.load_started)
-        browser_tab.browser.loadFinished.connect(self.load_finished)
+        browser_tab.loadStarted.connect(self.load_started)
+        browser_tab.loadFinished.connect(self.load_finished)
+        browser_tab.history_timer.timeout.connect(
+            lambda browser_tab=browser_tab: self.record_history_visit(browser_tab)
+        )
 
-        # Add tab
-        i = self.tabs.addTab(browser_tab, label)
-        self.tabs.setCurrentIndex(i)
+        # Placeholders count as open tabs for URL bar suggestions
+        self.omnibox.tab_moved(None, url)
+        browser_tab.open_url = url
 
-        # Navigate to URL
-        if url != "https://www.google.com":
-            browser_tab.browser.setUrl(QUrl(url))
+        # Add tab; showing it creates the view and loads the URL
+        i = self.tabs.addTab(browser_tab, label)
+        if browser_tab.pinned:
+            self.set_tab_pinned(browser_tab, True)
+        if not background:
+            self.tabs.setCurrentIndex(i)
 
         return browser_tab
 
     def close_tab(self, i):
-        """Close a tab"""
+        """Close a tab, keeping a snapshot for reopen_closed_tab"""
         if self.tabs.count() > 1:
+            browser_tab = self.tabs.widget(i)
+            self.record_history_visit(browser_tab)
+            self.omnibox.tab_moved(browser_tab.open_url, None)
+            self.closed_tabs.append(browser_tab.snapshot())
             self.tabs.removeTab(i)
+            browser_tab.teardown()
         else:
             self.close()
 
+    def reopen_closed_tab(self):
+        """Bring back the most recently closed tab with its back/forward history"""
+        if self.closed_tabs:
+            self.add_new_tab(state=self.closed_tabs.pop())
+
+    def show_tab_menu(self, pos):
+        """Context menu for a tab"""
+        i = self.tabs.tabBar().tabAt(pos)
+        if i < 0:
+            return
+        browser_tab = self.tabs.widget(i)
+
+        menu = QMenu(self)
+        pin_action = menu.addAction("Unpin Tab" if browser_tab.pinned else "Pin Tab")
+        close_action = menu.addAction("Close Tab")
+        reopen_action = menu.addAction("Reopen Closed Tab")
+        reopen_action.setEnabled(bool(self.closed_tabs))
+        chosen = menu.exec_(self.tabs.tabBar().mapToGlobal(pos))
+        if chosen == pin_action:
+            self.set_tab_pinned(browser_tab, not browser_tab.pinned)
+        elif chosen == close_action:
+            self.close_tab(self.tabs.indexOf(browser_tab))
+        elif chosen == reopen_action:
+            self.reopen_closed_tab()
+
+    def set_tab_pinned(self, browser_tab, pinned):
+        """Pinned tabs are never frozen or discarded"""
+        browser_tab.pinned = pinned
+        if pinned and browser_tab.browser is not None:
+            browser_tab.set_frozen(False)
+        i = self.tabs.indexOf(browser_tab)
+        self.tabs.setTabIcon(i, qta.icon("fa5s.thumbtack") if pinned else QIcon())
+
     def current_tab_changed(self, i):
         """Handle tab change"""
         if i >= 0:
             browser_tab = self.tabs.currentWidget()
             if browser_tab:
-                url = browser_tab.browser.url().toString()
+                # Showing the tab has already restored it if it was discarded
+                self.tab_manager.tab_activated(browser_tab)
+                url = browser_tab.url().toString()
                 self.url_bar.setText(url)
                 self.update_navigation_buttons()
 
     def update_url(self, qurl, browser_tab=None):
         """Update URL bar"""
+        url = qurl.toString()
         if browser_tab == self.tabs.currentWidget():
-            url = qurl.toString()
             self.url_bar.setText(url)
             self.update_navigation_buttons()
 
-            # Add to history
-            if url and url not in ["about:blank", ""]:
-                title = browser_tab.browser.title() if browser_tab else "Untitled"
-                self.add_to_history(url, title)
+        # Add to history, from background tabs too
+        if browser_tab is not None and url and url not in ["about:blank", ""]:
+            self.queue_history_visit(browser_tab, url)
+            self.omnibox.tab_moved(browser_tab.open_url, url)
+            browser_tab.open_url = url
 
     def update_title(self, title, browser_tab=None):
         """Update tab title"""
+        # Titles usually arrive after the URL was recorded
+        if browser_tab is not None and title:
+            self.history.set_title(browser_tab.url().toString(), title)
+            self.omnibox.set_title(browser_tab.url().toString(), title)
+
         index = self.tabs.indexOf(browser_tab)
         if index >= 0:
             # Limit title length
@@ -681,8 +4112,9 @@ class Synth(QMainWindow):
         """Update navigation button states"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            self.back_btn.setEnabled(browser_tab.browser.history().canGoBack())
-            self.forward_btn.setEnabled(browser_tab.browser.history().canGoForward())
+            history = browser_tab.browser.history() if browser_tab.browser is not None else None
+            self.back_btn.setEnabled(bool(history and history.canGoBack()))
+            self.forward_btn.setEnabled(bool(history and history.canGoForward()))
 
     def load_started(self):
         """Handle page load start"""
@@ -696,6 +4128,24 @@ class Synth(QMainWindow):
         # Extract dominant color from webpage
         self.extract_webpage_color()
 
+    def rebuild_omnibox(self):
+        """Reload the URL bar index from history and bookmarks"""
+        self.omnibox.rebuild(self.history.top_urls(OMNIBOX_INDEX_SIZE), self.bookmarks)
+
+    def update_url_suggestions(self, text):
+        """Refill the URL bar popup for what was just typed"""
+        self.url_suggestions.clear()
+        for entry in self.omnibox.suggest(text.strip()):
+            title = entry["title"] or entry["url"]
+            item = QStandardItem(f"{title}  —  {entry['url']}")
+            item.setData(entry["url"], Qt.UserRole)
+            self.url_suggestions.appendRow(item)
+
+        if self.url_suggestions.rowCount():
+            self.url_completer.complete()
+        else:
+            self.url_completer.popup().hide()
+
     def navigate_to_url(self):
         """Navigate to URL from URL bar"""
         url = self.url_bar.text().strip()
@@ -711,67 +4161,67 @@ class Synth(QMainWindow):
 
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.setUrl(QUrl(url))
+            browser_tab.load(url)
 
     def navigate_back(self):
         """Navigate back"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.back()
+            browser_tab.ensure_browser().back()
 
     def navigate_forward(self):
         """Navigate forward"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.forward()
+            browser_tab.ensure_browser().forward()
 
     def refresh_page(self):
         """Refresh current page"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.reload()
+            browser_tab.ensure_browser().reload()
 
     def navigate_home(self):
         """Navigate to home page"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.setUrl(QUrl("https://www.google.com"))
+            browser_tab.load("https://www.google.com")
 
     def stop_loading(self):
         """Stop loading page"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.stop()
+            browser_tab.ensure_browser().stop()
 
     # Zoom functions
     def zoom_in(self):
         """Zoom in"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            current_zoom = browser_tab.browser.zoomFactor()
-            browser_tab.browser.setZoomFactor(current_zoom + 0.1)
+            browser = browser_tab.ensure_browser()
+            browser.setZoomFactor(browser.zoomFactor() + 0.1)
             self.update_zoom_label()
 
     def zoom_out(self):
         """Zoom out"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            current_zoom = browser_tab.browser.zoomFactor()
-            browser_tab.browser.setZoomFactor(max(0.25, current_zoom - 0.1))
+            browser = browser_tab.ensure_browser()
+            browser.setZoomFactor(max(0.25, browser.zoomFactor() - 0.1))
             self.update_zoom_label()
 
     def zoom_reset(self):
         """Reset zoom"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            browser_tab.browser.setZoomFactor(1.0)
+            browser_tab.ensure_browser().setZoomFactor(1.0)
             self.update_zoom_label()
 
     def update_zoom_label(self):
         """Update zoom label"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            zoom = int(browser_tab.browser.zoomFactor() * 100)
+            zoom = int(browser_tab.browser.zoomFactor() * 100) if browser_tab.browser is not None else 100
             self.zoom_reset_btn.setText(f"{zoom}%")
 
     def extract_webpage_color(self):
@@ -782,10 +4232,10 @@ class Synth(QMainWindow):
 
         # Get the favicon color or use default
         # This is a simplified approach - we'll use the URL to determine color
-        url = browser_tab.browser.url().toString()
+        url = browser_tab.url().toString()
 
         # Use JavaScript to get the theme color from the webpage
-        browser_tab.browser.page().runJavaScript("""
+        browser_tab.ensure_browser().page().runJavaScript("""
             (function() {
                 var metaThemeColor = document.querySelector('meta[name="theme-color"]');
                 if (metaThemeColor) {
@@ -814,113 +4264,257 @@ class Synth(QMainWindow):
         self.apply_theme()
 
     # Bookmarks
-    def load_bookmarks(self):
-        """Load bookmarks from file"""
-        try:
-            if os.path.exists("bookmarks.json"):
-                with open("bookmarks.json", "r") as f:
-                    return json.load(f)
-        except:
-            pass
-        return []
-
-    def save_bookmarks(self):
-        """Save bookmarks to file"""
-        try:
-            with open("bookmarks.json", "w") as f:
-                json.dump(self.bookmarks, f, indent=2)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to save bookmarks: {str(e)}")
-
     def add_bookmark(self):
         """Add current page to bookmarks"""
         browser_tab = self.tabs.currentWidget()
         if browser_tab:
-            url = browser_tab.browser.url().toString()
-            title = browser_tab.browser.title()
+            url = browser_tab.url().toString()
+            title = browser_tab.title()
 
             # Check if already bookmarked
-            if any(b["url"] == url for b in self.bookmarks):
+            if url in self.bookmarks:
                 QMessageBox.information(self, "Bookmark", "This page is already bookmarked!")
                 return
 
-            self.bookmarks.append({"title": title, "url": url})
-            self.save_bookmarks()
+            try:
+                self.bookmarks.add(url, title)
+            except OSError as e:
+                QMessageBox.warning(self, "Error", f"Failed to save bookmarks: {str(e)}")
+                return
+            self.omnibox.set_bookmarked(url, title, True)
             QMessageBox.information(self, "Bookmark", "Page added to bookmarks!")
 
     def show_bookmarks(self):
         """Show bookmarks dialog"""
         dialog = QDialog(self)
         dialog.setWindowTitle("Bookmarks")
-        dialog.setMinimumSize(600, 400)
+        dialog.setMinimumSize(700, 480)
 
         layout = QVBoxLayout(dialog)
 
-        # Bookmarks list
-        list_widget = QListWidget()
-        list_widget.setObjectName("bookmarksList")
-
-        for bookmark in self.bookmarks:
-            item = QListWidgetItem(f"{bookmark['title']}\n{bookmark['url']}")
-            item.setData(Qt.UserRole, bookmark['url'])
-            list_widget.addItem(item)
-
-        list_widget.itemDoubleClicked.connect(
-            lambda item: self.open_bookmark(item.data(Qt.UserRole), dialog)
+        # Search box over titles, URLs, tags and folders
+        search_edit = QLineEdit()
+        search_edit.setPlaceholderText(f"Search {len(self.bookmarks)} bookmarks...")
+        search_edit.setObjectName("chatInput")
+        layout.addWidget(search_edit)
+
+        # Bookmarks tree, folders load as they expand
+        model = BookmarkTreeModel(self.bookmarks, dialog)
+        tree = QTreeView()
+        tree.setObjectName("bookmarksTree")
+        tree.setModel(model)
+        tree.setUniformRowHeights(True)
+        tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        model.set_filter("")
+        search_edit.textChanged.connect(model.set_filter)
+
+        def current_bookmark():
+            return tree.currentIndex().data(BookmarkTreeModel.BookmarkRole)
+
+        tree.doubleClicked.connect(
+            lambda index: self.open_bookmark(index.data(BookmarkTreeModel.BookmarkRole), dialog)
         )
 
-        layout.addWidget(list_widget)
+        layout.addWidget(tree)
 
         # Buttons
         btn_layout = QHBoxLayout()
 
         open_btn = QPushButton("Open")
-        open_btn.clicked.connect(
-            lambda: self.open_bookmark(
-                list_widget.currentItem().data(Qt.UserRole) if list_widget.currentItem() else None,
-                dialog
-            )
-        )
+        open_btn.clicked.connect(lambda: self.open_bookmark(current_bookmark(), dialog))
+
+        move_btn = QPushButton("Move to Folder")
+        move_btn.clicked.connect(lambda: self.move_bookmark(current_bookmark(), model, dialog))
+
+        tags_btn = QPushButton("Edit Tags")
+        tags_btn.clicked.connect(lambda: self.edit_bookmark_tags(current_bookmark(), model, dialog))
 
         delete_btn = QPushButton("Delete")
-        delete_btn.clicked.connect(
-            lambda: self.delete_bookmark(list_widget)
+        delete_btn.clicked.connect(lambda: self.delete_bookmark(current_bookmark(), model))
+
+        open_all_btn = QPushButton("Open All")
+        open_all_btn.setToolTip("Open every bookmark in the selected folder, or every match, in background tabs")
+        open_all_btn.clicked.connect(
+            lambda: self.open_all_bookmarks(model.shown_bookmarks(tree.currentIndex()), dialog)
         )
 
+        import_btn = QPushButton("Import")
+        import_btn.clicked.connect(lambda: self.import_bookmarks(model))
+
+        export_btn = QPushButton("Export")
+        export_btn.clicked.connect(self.export_bookmarks)
+
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(dialog.close)
 
         btn_layout.addWidget(open_btn)
+        btn_layout.addWidget(open_all_btn)
+        btn_layout.addWidget(move_btn)
+        btn_layout.addWidget(tags_btn)
         btn_layout.addWidget(delete_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(import_btn)
+        btn_layout.addWidget(export_btn)
         btn_layout.addWidget(close_btn)
 
         layout.addLayout(btn_layout)
 
         dialog.exec_()
 
-    def open_bookmark(self, url, dialog):
+    def open_bookmark(self, bookmark, dialog):
         """Open a bookmark"""
-        if url:
-            self.add_new_tab(url=url, label="Loading...")
+        if bookmark:
+            self.add_new_tab(url=bookmark["url"], label="Loading...")
             dialog.close()
 
-    def delete_bookmark(self, list_widget):
+    def open_all_bookmarks(self, bookmarks, dialog):
+        """Open bookmarks as background tabs; each loads only once it is first shown"""
+        if not bookmarks:
+            return
+        if len(bookmarks) > 50:
+            reply = QMessageBox.question(
+                dialog, "Open All",
+                f"Open {len(bookmarks)} bookmarks in new tabs?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+        for bookmark in bookmarks:
+            self.add_new_tab(url=bookmark["url"], label=bookmark["title"] or "New Tab", background=True)
+        dialog.close()
+
+    def move_bookmark(self, bookmark, model, dialog):
+        """File a bookmark under a folder path such as "Work/Docs" """
+        if not bookmark:
+            return
+        folder, ok = QInputDialog.getText(
+            dialog, "Move to Folder", "Folder (use / for subfolders, empty for top level):",
+            text=bookmark.get("folder", "")
+        )
+        if ok:
+            self.update_bookmark(bookmark["url"], model, folder=folder)
+
+    def edit_bookmark_tags(self, bookmark, model, dialog):
+        """Edit a bookmark's comma separated tags"""
+        if not bookmark:
+            return
+        tags, ok = QInputDialog.getText(
+            dialog, "Edit Tags", "Tags (comma separated):",
+            text=", ".join(bookmark.get("tags", []))
+        )
+        if ok:
+            self.update_bookmark(bookmark["url"], model, tags=tags.split(","))
+
+    def update_bookmark(self, url, model, **fields):
+        try:
+            self.bookmarks.update(url, **fields)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to save bookmarks: {str(e)}")
+        model.refresh()
+
+    def delete_bookmark(self, bookmark, model):
         """Delete a bookmark"""
-        current_item = list_widget.currentItem()
-        if current_item:
-            url = current_item.data(Qt.UserRole)
-            self.bookmarks = [b for b in self.bookmarks if b['url'] != url]
-            self.save_bookmarks()
-            list_widget.takeItem(list_widget.row(current_item))
+        if bookmark:
+            url = bookmark["url"]
+            try:
+                self.bookmarks.remove(url)
+            except OSError as e:
+                QMessageBox.warning(self, "Error", f"Failed to save bookmarks: {str(e)}")
+            self.omnibox.set_bookmarked(url, "", False)
+            model.refresh()
+
+    def import_bookmarks(self, model=None):
+        """Import a Netscape HTML or JSON bookmark file on a worker thread"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Bookmarks", "", "Bookmarks (*.html *.htm *.json)"
+        )
+        if not path:
+            return
+
+        progress = QProgressDialog("Importing bookmarks...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        worker = BookmarkImportWorker(path, self)
+        added = [0]
+
+        # Each batch is one journal write
+        def store_batch(batch):
+            try:
+                added[0] += len(self.bookmarks.add_many(batch))
+            except OSError as e:
+                worker.cancel()
+                QMessageBox.warning(self, "Error", f"Failed to save bookmarks: {str(e)}")
+
+        def finished():
+            progress.close()
+            self.rebuild_omnibox()
+            if model is not None:
+                model.refresh()
+            QMessageBox.information(self, "Import Bookmarks", f"Imported {added[0]} new bookmarks.")
+
+        worker.batch_ready.connect(store_batch)
+        worker.progress.connect(
+            lambda done, total: progress.setValue(int(done * 100 / total) if total else 100)
+        )
+        worker.failed.connect(lambda error: QMessageBox.warning(self, "Import Failed", error))
+        worker.finished.connect(finished)
+        worker.finished.connect(worker.deleteLater)
+        progress.canceled.connect(worker.cancel)
+        worker.start()
+
+    def export_bookmarks(self):
+        """Export all bookmarks as Netscape HTML or JSON on a worker thread"""
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Bookmarks", "bookmarks.html", "Netscape HTML (*.html);;JSON (*.json)"
+        )
+        if not path:
+            return
+        if not path.lower().endswith((".html", ".htm", ".json")):
+            path += ".json" if "json" in selected_filter.lower() else ".html"
+
+        progress = QProgressDialog("Exporting bookmarks...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        # Copies, so edits during the export don't race the writer
+        worker = BookmarkExportWorker([dict(b) for b in self.bookmarks], path, self)
+        worker.progress.connect(
+            lambda done, total: progress.setValue(int(done * 100 / total) if total else 100)
+        )
+        worker.failed.connect(lambda error: QMessageBox.warning(self, "Export Failed", error))
+        worker.finished.connect(progress.close)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
 
     # History
-    def add_to_history(self, url, title):
+    def add_to_history(self, url, title, visit_time=None):
         """Add to history"""
-        self.history_list.append({
-            "title": title,
-            "url": url,
-            "time": QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
-        })
+        self.history.add_visit(url, title, visit_time)
+
+    def queue_history_visit(self, browser_tab, url):
+        """Hold a visit until the tab stays on it, so redirect hops collapse into one"""
+        if browser_tab.pending_visit is None and normalize_url(url) == browser_tab.last_visit_url:
+            return  # Fragment-only change
+
+        # A redirect chain keeps the time of its first hop
+        started = browser_tab.pending_visit[1] if browser_tab.pending_visit else time.time()
+        browser_tab.pending_visit = (url, started)
+        browser_tab.history_timer.start()
+
+    def record_history_visit(self, browser_tab):
+        """Write a tab's settled visit to history"""
+        if browser_tab is None or browser_tab.pending_visit is None:
+            return
+        url, visit_time = browser_tab.pending_visit
+        browser_tab.pending_visit = None
+        browser_tab.history_timer.stop()
+
+        key = normalize_url(url)
+        if key != browser_tab.last_visit_url:
+            browser_tab.last_visit_url = key
+            self.add_to_history(url, browser_tab.title(), visit_time)
+            self.omnibox.add_visit(url, browser_tab.title(), visit_time)
 
     def show_history(self):
         """Show history dialog"""
@@ -930,44 +4524,59 @@ class Synth(QMainWindow):
 
         layout = QVBoxLayout(dialog)
 
-        # History list
-        list_widget = QListWidget()
-        list_widget.setObjectName("historyList")
-
-        for entry in reversed(self.history_list[-100:]):  # Show last 100 entries
-            item = QListWidgetItem(
-                f"{entry['time']}\n{entry['title']}\n{entry['url']}"
-            )
-            item.setData(Qt.UserRole, entry['url'])
-            list_widget.addItem(item)
-
-        list_widget.itemDoubleClicked.connect(
-            lambda item: self.open_history_item(item.data(Qt.UserRole), dialog)
-        )
-
-        layout.addWidget(list_widget)
+        # Search box, e.g. "kubernetes last week"
+        search_edit = QLineEdit()
+        search_edit.setPlaceholderText("Search history (try \"kubernetes last week\")...")
+        search_edit.setObjectName("chatInput")
+        layout.addWidget(search_edit)
+
+        # History list, paged in from the store as it scrolls
+        self.history.flush()
+        model = HistoryModel(self.history, dialog)
+        list_view = QListView()
+        list_view.setObjectName("historyView")
+        list_view.setModel(model)
+        list_view.setLayoutMode(QListView.Batched)
+        list_view.setBatchSize(HistoryModel.PAGE_SIZE)
+        model.set_filter("")
+
+        # Debounce typing so each keystroke doesn't hit the database
+        search_timer = QTimer(dialog)
+        search_timer.setSingleShot(True)
+        search_timer.setInterval(120)
+        search_timer.timeout.connect(lambda: model.set_filter(search_edit.text()))
+        search_edit.textChanged.connect(search_timer.start)
+
+        def current_url():
+            entry = list_view.currentIndex().data(HistoryModel.EntryRole)
+            return entry["url"] if entry and entry["kind"] == "visit" else None
+
+        list_view.doubleClicked.connect(lambda index: self.open_history_item(current_url(), dialog))
+
+        layout.addWidget(list_view)
 
         # Buttons
         btn_layout = QHBoxLayout()
 
         open_btn = QPushButton("Open")
-        open_btn.clicked.connect(
-            lambda: self.open_history_item(
-                list_widget.currentItem().data(Qt.UserRole) if list_widget.currentItem() else None,
-                dialog
-            )
-        )
+        open_btn.clicked.connect(lambda: self.open_history_item(current_url(), dialog))
+
+        range_combo = QComboBox()
+        for label in HISTORY_DELETE_RANGES:
+            range_combo.addItem(label)
 
-        clear_btn = QPushButton("Clear History")
-        clear_btn.clicked.connect(
-            lambda: self.clear_history(list_widget)
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(
+            lambda: self.delete_history_range(range_combo.currentText(), model)
         )
 
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(dialog.close)
 
         btn_layout.addWidget(open_btn)
-        btn_layout.addWidget(clear_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(range_combo)
+        btn_layout.addWidget(delete_btn)
         btn_layout.addWidget(close_btn)
 
         layout.addLayout(btn_layout)
@@ -980,17 +4589,24 @@ class Synth(QMainWindow):
             self.add_new_tab(url=url, label="Loading...")
             dialog.close()
 
-    def clear_history(self, list_widget):
-        """Clear history"""
+    def delete_history_range(self, label, model):
+        """Delete history from one of HISTORY_DELETE_RANGES"""
         reply = QMessageBox.question(
-            self, "Clear History",
-            "Are you sure you want to clear all history?",
+            self, "Delete History",
+            f"Delete history from {label.lower()}?",
             QMessageBox.Yes | QMessageBox.No
         )
+        if reply != QMessageBox.Yes:
+            return
 
-        if reply == QMessageBox.Yes:
-            self.history_list.clear()
-            list_widget.clear()
+        seconds = HISTORY_DELETE_RANGES[label]
+        if seconds is None:
+            self.history.clear()
+        else:
+            now = time.time()
+            self.history.delete_range(now - seconds, now + 1)
+        model.refresh()
+        self.rebuild_omnibox()
 
     # AI Features
     def open_chat_window(self):
@@ -1004,25 +4620,74 @@ class Synth(QMainWindow):
             self.chat_panel.load_history()
         self.chat_panel.toggle()
 
-    def generate_response(self, prompt):
-        """Generate AI response using latest g4f models"""
-        try:
-            # Try with GPT-4 (best quality)
-            response = self.g4f_client.chat.completions.create(
-                model="gpt-4",  # Latest models available: gpt-4, gpt-4-turbo, claude-3-opus, gemini-pro
-                messages=self.chat_history,
+    def chat_messages_before(self, message_id, limit):
+        """Return up to limit messages that precede message_id in the session"""
+        return self.chat_store.messages_before(self.chat_session_id, message_id, limit)
+
+    def chat_messages_after(self, message_id, limit):
+        """Return up to limit messages that follow message_id in the session"""
+        return self.chat_store.messages_after(self.chat_session_id, message_id, limit)
+
+    def add_chat_message(self, role, content):
+        """Append a message with a stable id to the chat history and the session store"""
+        message = {
+            "id": uuid.uuid4().hex,
+            "role": role,
+            "content": content
+        }
+        if self.chat_session_id is None:
+            self.chat_session_id = self.chat_store.create_session()
+        self.chat_history.append(message)
+        self.chat_store.append_message(self.chat_session_id, message)
+
+        # Name new sessions after their first question
+        if role == "user" and len(self.chat_history) == 1:
+            self.chat_store.rename_session(self.chat_session_id, content[:40])
+            self.chat_panel.refresh_sessions()
+
+        # Turns folded into the summary are only kept in the session store
+        del self.chat_history[:self.context_window.folded_count(self.chat_history)]
+        return message
+
+    def switch_chat_session(self, session_id):
+        """Make another session current, loading only its newest page
+
+        A session_id of None starts a new chat that is stored on its first
+        message.
+        """
+        self.chat_session_id = session_id
+        if session_id is None:
+            self.chat_history = []
+        else:
+            self.chat_history = self.chat_store.recent_messages(session_id, ChatMessageModel.PAGE_SIZE)
+        self.context_window.reset()
+
+    def new_chat_session(self):
+        """Start a new empty session"""
+        self.switch_chat_session(None)
+
+    def summarize_messages(self, summary, messages, is_cancelled=lambda: False):
+        """Fold messages into the running conversation summary (blocking)"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = [{
+            "role": "user",
+            "content": (
+                "Update the summary of this conversation. Keep names, facts, decisions "
+                "and open questions; be concise.\n\n"
+                f"Current summary:\n{summary or '(none)'}\n\n"
+                f"New messages:\n{transcript}"
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            # Fallback to GPT-3.5-turbo if GPT-4 fails
-            try:
-                response = self.g4f_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=self.chat_history,
-                )
-                return response.choices[0].message.content
-            except Exception as fallback_error:
-                raise Exception(f"AI service unavailable. Primary error: {str(e)}, Fallback error: {str(fallback_error)}")
+        }]
+        summary = "".join(self.stream_response(prompt, is_cancelled))
+        if is_cancelled():
+            # A partial summary would be kept; let the caller fall back instead
+            raise RuntimeError("Summary cancelled")
+        return summary
+
+    def stream_response(self, messages, is_cancelled=lambda: False, info=None):
+        """Yield AI response deltas from the fastest healthy model"""
+        # Latest models available: gpt-4, gpt-4-turbo, claude-3-opus, gemini-pro
+        yield from self.ai_race.stream(messages, is_cancelled, info)
 
     def open_image_window(self):
         """Open AI image generation window"""
@@ -1052,8 +4717,14 @@ class Synth(QMainWindow):
         generate_btn.setCursor(Qt.PointingHandCursor)
         generate_btn.setMinimumHeight(40)
 
+        batch_btn = QPushButton("Batch...")
+        batch_btn.setCursor(Qt.PointingHandCursor)
+        batch_btn.setMinimumHeight(40)
+        batch_btn.setToolTip("Generate many prompts at once")
+
         input_layout.addWidget(input_edit)
         input_layout.addWidget(generate_btn)
+        input_layout.addWidget(batch_btn)
 
         layout.addLayout(input_layout)
 
@@ -1066,72 +4737,288 @@ class Synth(QMainWindow):
         image_label.setAlignment(Qt.AlignCenter)
         image_label.setMinimumSize(400, 400)
 
-        # Load placeholder or previous image
-        if os.path.exists("assets/temp_img.png"):
-            pixmap = QPixmap("assets/temp_img.png")
-        else:
-            pixmap = QPixmap("assets/placeholder.jpg")
-
-        if not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(
-                500, 500,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            image_label.setPixmap(scaled_pixmap)
+        # Load placeholder or latest image
+        latest = self.image_store.entries(limit=1)
+        self.display_image(latest[0][0] if latest else "assets/placeholder.jpg", image_label)
 
         scroll_area.setWidget(image_label)
         layout.addWidget(scroll_area)
 
+        # Gallery of earlier results
+        gallery = QListWidget()
+        gallery.setObjectName("imageGallery")
+        gallery.setViewMode(QListView.IconMode)
+        gallery.setFlow(QListView.LeftToRight)
+        gallery.setWrapping(False)
+        gallery.setMovement(QListView.Static)
+        gallery.setIconSize(QSize(96, 96))
+        gallery.setFixedHeight(124)
+        gallery.itemClicked.connect(
+            lambda item: self.open_gallery_item(item, input_edit, image_label)
+        )
+        self.populate_gallery(gallery)
+        layout.addWidget(gallery)
+
         # Status label
         status_label = QLabel("Ready to generate")
         status_label.setAlignment(Qt.AlignCenter)
         status_label.setStyleSheet("color: #666; margin: 10px;")
         layout.addWidget(status_label)
 
+        # Progress and cancel
+        progress_layout = QHBoxLayout()
+
+        progress_bar = QProgressBar()
+        progress_bar.setObjectName("loadProgress")
+        progress_bar.setTextVisible(False)
+        progress_bar.setMaximumHeight(4)
+        progress_bar.hide()
+
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setCursor(Qt.PointingHandCursor)
+        cancel_btn.hide()
+
+        progress_layout.addWidget(progress_bar, 1)
+        progress_layout.addWidget(cancel_btn)
+        layout.addLayout(progress_layout)
+
         # Connect generate button
         generate_btn.clicked.connect(
-            lambda: self.generate_image(input_edit, image_label, status_label)
+            lambda: self.generate_image(input_edit, image_label, status_label, progress_bar, cancel_btn, gallery)
         )
         input_edit.returnPressed.connect(
-            lambda: self.generate_image(input_edit, image_label, status_label)
+            lambda: self.generate_image(input_edit, image_label, status_label, progress_bar, cancel_btn, gallery)
+        )
+        cancel_btn.clicked.connect(
+            lambda: self.cancel_image_job(status_label, progress_bar, cancel_btn)
+        )
+        batch_btn.clicked.connect(
+            lambda: (self.open_batch_image_window(image_dialog), self.populate_gallery(gallery))
         )
 
         image_dialog.exec_()
 
-    def generate_image(self, input_edit, image_label, status_label):
-        """Generate AI image"""
+        # Don't deliver results to a closed dialog
+        self.cancel_image_job()
+
+    def generate_image(self, input_edit, image_label, status_label, progress_bar, cancel_btn, gallery):
+        """Generate AI image in the background, superseding any job in progress"""
         prompt = input_edit.text().strip()
         if not prompt:
             return
 
+        self.cancel_image_job()
+
+        # Same prompt as before: show the stored image right away
+        cached_path = self.image_store.lookup(prompt)
+        if cached_path:
+            self.display_image(cached_path, image_label)
+            status_label.setText("Loaded from image library")
+            status_label.setStyleSheet("color: #4CAF50; margin: 10px;")
+            return
+
         status_label.setText("Generating image... Please wait.")
         status_label.setStyleSheet("color: #2196F3; margin: 10px;")
-        QApplication.processEvents()
-
-        try:
-            url = "https://hercai.onrender.com/prodia/text2image?prompt=" + prompt
-            response = requests.get(url, timeout=30)
-            image_url = response.json()["url"]
-
-            # Save image
-            with open("assets/temp_img.png", "wb") as f:
-                f.write(requests.get(image_url).content)
-
-            # Display image
-            pixmap = QPixmap("assets/temp_img.png")
-            scaled_pixmap = pixmap.scaled(
-                500, 500,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
+        progress_bar.setRange(0, 0)
+        progress_bar.show()
+        cancel_btn.show()
+
+        worker = ImageWorker(prompt, self.image_store.incoming_path(), self.http, self)
+        worker.progress.connect(
+            lambda stage, received, total: self.update_image_progress(
+                status_label, progress_bar, stage, received, total
+            )
+        )
+        worker.image_ready.connect(
+            lambda path, content_hash: self.show_generated_image(
+                self.image_store.add(prompt, path, content_hash),
+                image_label, status_label, progress_bar, cancel_btn, gallery
             )
-            image_label.setPixmap(scaled_pixmap)
+        )
+        worker.failed.connect(
+            lambda error: self.image_job_failed(error, status_label, progress_bar, cancel_btn)
+        )
+        worker.finished.connect(worker.deleteLater)
+        self.image_worker = worker
+        worker.start()
+
+    def display_image(self, path, image_label):
+        """Show an image scaled to fit the dialog"""
+        # Ignore a slower decode finishing after a newer image was requested
+        image_label.setProperty("image_path", path)
+
+        def show(pixmap):
+            if image_label.property("image_path") == path:
+                image_label.setPixmap(pixmap)
+
+        self.image_loader.load(path, QSize(500, 500), show)
+
+    def populate_gallery(self, gallery):
+        """Fill the gallery with stored images, newest first"""
+        gallery.clear()
+        for path, entry in self.image_store.entries(limit=100):
+            item = QListWidgetItem("")
+            self.image_loader.load(path, QSize(96, 96), lambda pixmap, item=item: item.setIcon(QIcon(pixmap)))
+            item.setToolTip(entry["prompt"])
+            item.setData(Qt.UserRole, path)
+            item.setData(Qt.UserRole + 1, entry["prompt"])
+            gallery.addItem(item)
+
+    def open_gallery_item(self, item, input_edit, image_label):
+        """Show a gallery image and its prompt"""
+        self.display_image(item.data(Qt.UserRole), image_label)
+        input_edit.setText(item.data(Qt.UserRole + 1))
+
+    def open_batch_image_window(self, parent_dialog):
+        """Open the batch image generation window"""
+        dialog = QDialog(parent_dialog)
+        dialog.setWindowTitle("Batch Image Generation")
+        dialog.setMinimumSize(720, 640)
+        dialog.setObjectName("aiDialog")
 
-            status_label.setText("Image generated successfully!")
-            status_label.setStyleSheet("color: #4CAF50; margin: 10px;")
-        except Exception as e:
-            status_label.setText(f"Error: {str(e)}")
-            status_label.setStyleSheet("color: #f44336; margin: 10px;")
+        layout = QVBoxLayout(dialog)
+
+        prompts_edit = QPlainTextEdit()
+        prompts_edit.setPlaceholderText("One prompt per line...")
+        prompts_edit.setMaximumHeight(140)
+        layout.addWidget(prompts_edit)
+
+        # Controls
+        controls_layout = QHBoxLayout()
+
+        load_btn = QPushButton("Load File...")
+        concurrency_label = QLabel("Parallel jobs")
+        concurrency_spin = QSpinBox()
+        concurrency_spin.setRange(1, 8)
+        concurrency_spin.setValue(IMAGE_BATCH_CONCURRENCY)
+
+        start_btn = QPushButton("Start")
+        start_btn.setObjectName("sendButton")
+        start_btn.setCursor(Qt.PointingHandCursor)
+        stop_btn = QPushButton("Cancel All")
+
+        controls_layout.addWidget(load_btn)
+        controls_layout.addStretch()
+        controls_layout.addWidget(concurrency_label)
+        controls_layout.addWidget(concurrency_spin)
+        controls_layout.addWidget(start_btn)
+        controls_layout.addWidget(stop_btn)
+        layout.addLayout(controls_layout)
+
+        # Results grid
+        results = QListWidget()
+        results.setObjectName("imageGallery")
+        results.setViewMode(QListView.IconMode)
+        results.setResizeMode(QListView.Adjust)
+        results.setMovement(QListView.Static)
+        results.setIconSize(QSize(128, 128))
+        results.setGridSize(QSize(150, 180))
+        results.setWordWrap(True)
+        layout.addWidget(results, 1)
+
+        summary_label = QLabel("Add prompts and press Start")
+        summary_label.setStyleSheet("color: #666; margin: 6px;")
+        layout.addWidget(summary_label)
+
+        batch_queue = ImageBatchQueue(self.image_store, self.http, parent=dialog)
+
+        def load_file():
+            path, _ = QFileDialog.getOpenFileName(dialog, "Load Prompts", "", "Text Files (*.txt);;All Files (*)")
+            if path:
+                with open(path, "r", encoding="utf-8") as f:
+                    prompts_edit.setPlainText(f.read())
+
+        def update_job(index):
+            job = batch_queue.jobs[index]
+            item = results.item(index)
+            item.setText(f"{job['prompt'][:40]}\n{job['status']}")
+            if job["path"] and job["status"] == "Done":
+                self.image_loader.load(
+                    job["path"], QSize(128, 128), lambda pixmap: item.setIcon(QIcon(pixmap))
+                )
+            done = sum(1 for j in batch_queue.jobs if j["status"] == "Done")
+            summary_label.setText(f"{done} of {len(batch_queue.jobs)} done")
+
+        def start():
+            prompts = [line.strip() for line in prompts_edit.toPlainText().splitlines() if line.strip()]
+            if not prompts:
+                return
+            for prompt in prompts:
+                item = QListWidgetItem(f"{prompt[:40]}\nQueued")
+                item.setToolTip(prompt)
+                results.addItem(item)
+            prompts_edit.clear()
+            set_running(True)
+            batch_queue.add(prompts)
+
+        def set_running(running):
+            start_btn.setEnabled(not running)
+            load_btn.setEnabled(not running)
+            stop_btn.setEnabled(running)
+
+        set_running(False)
+        load_btn.clicked.connect(load_file)
+        start_btn.clicked.connect(start)
+        stop_btn.clicked.connect(batch_queue.cancel)
+        batch_queue.job_updated.connect(update_job)
+        batch_queue.all_done.connect(lambda: set_running(False))
+        concurrency_spin.valueChanged.connect(batch_queue.set_concurrency)
+
+        dialog.exec_()
+
+        if batch_queue.is_running():
+            batch_queue.cancel()
+
+    def cancel_image_job(self, status_label=None, progress_bar=None, cancel_btn=None):
+        """Cancel the running image job and stop listening to it"""
+        worker = getattr(self, "image_worker", None)
+        if worker is None:
+            return
+
+        worker.cancel()
+        worker.progress.disconnect()
+        worker.image_ready.disconnect()
+        worker.failed.disconnect()
+        self.image_worker = None
+
+        if status_label is not None:
+            status_label.setText("Cancelled")
+            status_label.setStyleSheet("color: #666; margin: 10px;")
+            progress_bar.hide()
+            cancel_btn.hide()
+
+    def update_image_progress(self, status_label, progress_bar, stage, received, total):
+        """Reflect image job progress in the dialog"""
+        if total > 0:
+            status_label.setText(f"{stage} {received * 100 // total}%")
+            progress_bar.setRange(0, total)
+            progress_bar.setValue(received)
+        else:
+            if received:
+                status_label.setText(f"{stage} {received // 1024} KB")
+            else:
+                status_label.setText(stage)
+            progress_bar.setRange(0, 0)
+
+    def show_generated_image(self, path, image_label, status_label, progress_bar, cancel_btn, gallery):
+        """Display a finished image job"""
+        self.image_worker = None
+        progress_bar.hide()
+        cancel_btn.hide()
+
+        self.display_image(path, image_label)
+        self.populate_gallery(gallery)
+
+        status_label.setText("Image generated successfully!")
+        status_label.setStyleSheet("color: #4CAF50; margin: 10px;")
+
+    def image_job_failed(self, error, status_label, progress_bar, cancel_btn):
+        """Report a failed image job"""
+        self.image_worker = None
+        progress_bar.hide()
+        cancel_btn.hide()
+        status_label.setText(f"Error: {error}")
+        status_label.setStyleSheet("color: #f44336; margin: 10px;")
 
     # Settings
     def open_settings(self):
@@ -1190,12 +5077,74 @@ class Synth(QMainWindow):
         vertical_tabs_container.addWidget(self.vertical_tabs_switch)
         layout.addLayout(vertical_tabs_container)
 
+        # Background Tab Freezing
+        freeze_container = QHBoxLayout()
+        freeze_label = QLabel("Freeze Background Tabs After")
+        freeze_label.setStyleSheet("font-size: 14px;")
+        freeze_spin = QSpinBox()
+        freeze_spin.setRange(1, 240)
+        freeze_spin.setSuffix(" min")
+        freeze_spin.setValue(max(1, self.tab_manager.freeze_delay // 60))
+        freeze_spin.valueChanged.connect(lambda minutes: setattr(self.tab_manager, "freeze_delay", minutes * 60))
+        freeze_container.addWidget(freeze_label)
+        freeze_container.addStretch()
+        freeze_container.addWidget(freeze_spin)
+        layout.addLayout(freeze_container)
+
+        # Tab Memory Budget
+        memory_container = QHBoxLayout()
+        memory_label = QLabel("Tab Memory Budget")
+        memory_label.setStyleSheet("font-size: 14px;")
+        memory_spin = QSpinBox()
+        memory_spin.setRange(256, 32768)
+        memory_spin.setSingleStep(256)
+        memory_spin.setSuffix(" MB")
+        memory_spin.setValue(self.tab_manager.budget_mb)
+        memory_spin.valueChanged.connect(self.set_tab_memory_budget)
+        memory_container.addWidget(memory_label)
+        memory_container.addStretch()
+        memory_container.addWidget(memory_spin)
+        layout.addLayout(memory_container)
+
+        memory_info = QLabel(self.tab_manager.summary())
+        memory_info.setStyleSheet("font-size: 12px; color: #808080;")
+        memory_info.setWordWrap(True)
+        layout.addWidget(memory_info)
+
         # Separator
         separator2 = QFrame()
         separator2.setFrameShape(QFrame.HLine)
         separator2.setStyleSheet("background-color: rgba(128, 128, 128, 0.2);")
         layout.addWidget(separator2)
 
+        # AI Providers Section
+        providers_label = QLabel("AI Providers")
+        providers_label.setStyleSheet("font-size: 16px; font-weight: 600; margin-top: 10px;")
+        layout.addWidget(providers_label)
+
+        providers_info = QLabel(
+            "\n".join(self.provider_health.summary(spec["model"]) for spec in AI_MODELS)
+        )
+        providers_info.setStyleSheet("font-size: 12px; color: #808080;")
+        providers_info.setWordWrap(True)
+        layout.addWidget(providers_info)
+
+        cache_info = QLabel(f"Response cache: {self.response_cache.stats()}")
+        cache_info.setStyleSheet("font-size: 12px; color: #808080;")
+        cache_info.setWordWrap(True)
+        layout.addWidget(cache_info)
+
+        network_info = QLabel(f"Network:\n{self.http.stats()}")
+        network_info.setStyleSheet("font-size: 12px; color: #808080;")
+        network_info.setWordWrap(True)
+        layout.addWidget(network_info)
+
+        # Separator
+        separator3 = QFrame()
+        separator3.setFrameShape(QFrame.HLine)
+        separator3.setStyleSheet("background-color: rgba(128, 128, 128, 0.2);")
+        layout.addWidget(separator3)
+
         # About Section
         about_label = QLabel("About")
         about_label.setStyleSheet("font-size: 16px; font-weight: 600; margin-top: 10px;")
@@ -1215,6 +5164,7 @@ class Synth(QMainWindow):
             "• Meta+Tab - New Tab\n"
             "• Ctrl+T - New Tab\n"
             "• Ctrl+W - Close Tab\n"
+            "• Ctrl+Shift+T - Reopen Closed Tab\n"
             "• Ctrl+L - Focus URL Bar\n"
             "• F5 - Refresh Page\n"
             "• Alt+A - Toggle AI Chat\n"
@@ -1235,6 +5185,85 @@ class Synth(QMainWindow):
 
         dialog.exec_()
 
+    # Session
+    def load_session(self):
+        """Read the last saved session, or None"""
+        try:
+            if os.path.exists(self.session_path):
+                with open(self.session_path, "r") as f:
+                    return json.load(f)
+        except:
+            pass
+        return None
+
+    def save_session(self):
+        """Write open tabs (with navigation history) and UI state; skipped when nothing changed"""
+        tabs = []
+        for i in range(self.tabs.count()):
+            state = self.tabs.widget(i).snapshot()
+            history = state["history"]
+            state["history"] = bytes(history.toBase64()).decode("ascii") if history is not None else None
+            tabs.append(state)
+
+        session = {
+            "tabs": tabs,
+            "current": self.tabs.currentIndex(),
+            "vertical_tabs": self.vertical_tabs,
+            "dark_mode": self.dark_mode,
+        }
+        if session == self.last_session:
+            return
+        try:
+            write_json_atomic(self.session_path, session)
+            self.last_session = session
+        except OSError:
+            pass
+
+    def restore_session(self, session):
+        """Recreate the saved tabs as placeholders; only the current one loads"""
+        if not session or not session.get("tabs"):
+            return False
+
+        for state in session["tabs"]:
+            state = dict(state)
+            if state.get("history"):
+                state["history"] = QByteArray.fromBase64(state["history"].encode("ascii"))
+            self.add_new_tab(state=state, background=True)
+
+        current = session.get("current", 0)
+        self.tabs.setCurrentIndex(current if 0 <= current < self.tabs.count() else 0)
+        return True
+
+    def closeEvent(self, event):
+        """Stop background workers and flush pending writes before the window closes"""
+        # Workers write to the stores closed below, so join them first
+        workers = self.findChildren(QThread)
+        for worker in workers:
+            if hasattr(worker, "cancel"):
+                worker.cancel()
+        deadline = time.monotonic() + WORKER_JOIN_TIMEOUT
+        for worker in workers:
+            remaining = max(0, deadline - time.monotonic())
+            if not worker.wait(int(remaining * 1000)):
+                # Blocked in a network call that cancel() can't interrupt
+                worker.blockSignals(True)
+                worker.terminate()
+                worker.wait()
+
+        self.save_session()
+        for i in range(self.tabs.count()):
+            self.record_history_visit(self.tabs.widget(i))
+        self.history.close()
+        self.bookmarks.close()
+        self.image_store.close()
+        self.provider_health.flush()
+        super().closeEvent(event)
+
+    def set_tab_memory_budget(self, budget_mb):
+        """Change the tab memory budget and apply it right away"""
+        self.tab_manager.budget_mb = budget_mb
+        self.tab_manager.enforce_budget()
+
     # Tabs Orientation
     def toggle_tabs_orientation(self):
         """Toggle between horizontal and vertical tabs"""
@@ -1401,7 +5430,7 @@ class Synth(QMainWindow):
                 border: 1px solid {colors['glass_stroke']};
                 border-radius: 14px;
             }}
-            QTextEdit#chatOutput {{
+            QListView#chatOutput {{
                 background: {colors['panel']};
                 border: 1px solid {colors['stroke']};
                 border-radius: 12px;
@@ -1435,6 +5464,18 @@ class Synth(QMainWindow):
             QPushButton#sendButton:pressed, QPushButton#chatSendButton:pressed {{
                 background: {accent_soft};
             }}
+            QPushButton#chatStopButton {{
+                background: #ff5370;
+                color: #ffffff;
+                border: none;
+                border-radius: 10px;
+                padding: 11px 20px;
+                font-weight: 700;
+                font-size: 14px;
+            }}
+            QPushButton#chatStopButton:hover {{
+                background: #e0445f;
+            }}
             QPushButton#chatClearButton {{
                 background: {colors['panel']};
                 color: {colors['muted_strong']};
@@ -1454,6 +5495,13 @@ class Synth(QMainWindow):
                 background: {colors['glass']};
                 border-bottom: 1px solid {colors['glass_stroke']};
             }}
+            QComboBox#chatSessionCombo {{
+                background: {colors['panel']};
+                border: 1px solid {colors['stroke']};
+                border-radius: 8px;
+                padding: 6px 10px;
+                color: {colors['text']};
+            }}
             QPushButton#chatCloseButton {{
                 background: transparent;
                 border: none;
@@ -1470,22 +5518,28 @@ class Synth(QMainWindow):
                 border: 1px solid {colors['stroke']};
                 border-radius: 10px;
             }}
-            QListWidget#bookmarksList, QListWidget#historyList {{
+            QListWidget#imageGallery {{
+                background: {colors['panel']};
+                border: 1px solid {colors['stroke']};
+                border-radius: 10px;
+                padding: 6px;
+            }}
+            QListWidget#bookmarksList, QListWidget#historyList, QListView#historyView, QTreeView#bookmarksTree {{
                 background: {colors['panel']};
                 border: 1px solid {colors['stroke']};
                 border-radius: 10px;
                 color: {colors['text']};
                 padding: 8px;
             }}
-            QListWidget#bookmarksList::item, QListWidget#historyList::item {{
+            QListWidget#bookmarksList::item, QListWidget#historyList::item, QListView#historyView::item, QTreeView#bookmarksTree::item {{
                 padding: 10px;
                 border-radius: 8px;
                 margin: 2px 0px;
             }}
-            QListWidget#bookmarksList::item:hover, QListWidget#historyList::item:hover {{
+            QListWidget#bookmarksList::item:hover, QListWidget#historyList::item:hover, QListView#historyView::item:hover, QTreeView#bookmarksTree::item:hover {{
                 background: {colors['hover']};
             }}
-            QListWidget#bookmarksList::item:selected, QListWidget#historyList::item:selected {{
+            QListWidget#bookmarksList::item:selected, QListWidget#historyList::item:selected, QListView#historyView::item:selected, QTreeView#bookmarksTree::item:selected {{
                 background: {accent};
                 color: #ffffff;
             }}